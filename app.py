@@ -1,23 +1,27 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from utils import (
     init_db,
     add_product,
     add_product_link,
     get_user_products,
+    get_link_history,
+    HISTORY_RESOLUTIONS,
+    HISTORY_PAGE_SIZE,
     get_user_by_id,
     create_or_update_user,
-    log_price,
     check_link_exists,
     delete_product_link,
     update_product_name,
     verify_user,
     create_user,
     create_or_update_google_user,
+    delete_product_and_links,
     get_db_connection
 )
-from scraper import fetch_product_info, update_prices
+import dashboard_cache
+import jobs
 from urllib.parse import urlparse
 from dotenv import load_dotenv
 from datetime import datetime
@@ -25,7 +29,6 @@ import threading
 import time
 from authlib.integrations.flask_client import OAuth
 from itertools import zip_longest
-from flask_caching import Cache
 import sqlite3
 from contextlib import contextmanager
 import logging
@@ -55,12 +58,12 @@ google = oauth.register(
     client_kwargs={'scope': 'openid email profile'}
 )
 
-# Adicione cache se necessário
-cache = Cache(app, config={'CACHE_TYPE': 'simple'})
-
 # Configuração do logger
 logging.basicConfig(level=logging.DEBUG)
 
+# Garante que as tabelas existam antes de atender requisições
+init_db()
+
 class User(UserMixin):
     def __init__(self, user_id, name, email):
         self.id = user_id
@@ -77,12 +80,58 @@ def load_user(user_id):
 @app.route('/')
 @login_required
 def index():
-    products = get_user_products(current_user.id)
-    print("Produtos carregados:", products)  # Debug
-    for product in products:
-        for link in product['links']:
-            print(f"Link encontrado: {link}")  # Debug dos links
-    return render_template('index.html', products=products)
+    # O histórico dos gráficos é carregado sob demanda por /api/links/<id>/history.
+    # Os dados ficam no cache compartilhado até o usuário ou a atualização de
+    # preços alterar algum produto/link dele.
+    products, hit = dashboard_cache.get_or_compute(
+        current_user.id,
+        lambda: get_user_products(current_user.id)
+    )
+    response = app.make_response(render_template('index.html', products=products))
+    response.headers['X-Dashboard-Cache'] = 'hit' if hit else 'miss'
+    return response
+
+@app.route('/api/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    """
+    Estado de um job de scraping (pending/running/done/failed) para a
+    página acompanhar o cadastro de um link
+    """
+    job = jobs.get_job(job_id, current_user.id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado'}), 404
+    return jsonify(job)
+
+@app.route('/api/dashboard_cache/stats')
+@login_required
+def dashboard_cache_stats():
+    """
+    Contadores de acerto/falta do cache do dashboard neste worker
+    """
+    return jsonify(dashboard_cache.get_stats())
+
+@app.route('/api/links/<link_id>/history')
+@login_required
+def link_history(link_id):
+    """
+    Histórico de preços de um link em JSON, paginado por since/limit.
+    Responde 304 quando o ETag enviado pelo navegador ainda é válido.
+    """
+    resolution = request.args.get('resolution', 'auto')
+    if resolution not in HISTORY_RESOLUTIONS:
+        return jsonify({'error': f"resolution deve ser um de: {', '.join(HISTORY_RESOLUTIONS)}"}), 400
+    limit = min(max(request.args.get('limit', HISTORY_PAGE_SIZE, type=int), 1), HISTORY_PAGE_SIZE)
+
+    history = get_link_history(link_id, current_user.id, request.args.get('since'), resolution, limit)
+    if history is None:
+        return jsonify({'error': 'Link não encontrado'}), 404
+
+    response = jsonify(history)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.add_etag()
+    return response.make_conditional(request)
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -178,29 +227,16 @@ def add_link():
             return redirect(url_for('index'))
 
         try:
-            # Busca informações do produto na URL fornecida (preço, imagens, etc)
-            product_info = fetch_product_info(product_url)
-            
-            # Log das informações obtidas
-            print(f"Informações obtidas do produto: {product_info}")
-            
-            # Tenta adicionar o link ao produto usando a função do utils.py
+            # Cadastra o link na hora; preço, imagem e logos são buscados por
+            # um job em segundo plano (ver jobs.py)
             link_id = add_product_link(
                 product_id=product_id,  # ID do produto ao qual o link será vinculado
                 product_url=product_url,  # URL fornecida pelo usuário
-                site_name=urlparse(product_url).netloc,  # Nome do site extraído da URL
-                image_url=product_info.get('image_url'),  # Imagem do produto (se encontrada)
-                favicon_url=product_info.get('favicon_url'),  # Favicon do site (se encontrado)
-                logo_url=product_info.get('logo_url')  # Logo do site (se encontrado)
+                site_name=urlparse(product_url).netloc  # Nome do site extraído da URL
             )
-            
-            # Se o link foi adicionado com sucesso e tem preço, registra o preço
-            if product_info.get('price'):
-                log_price(link_id, product_info['price'])  # Registra o preço inicial
-                flash(f'Link adicionado com sucesso! Preço atual: R$ {product_info["price"]:.2f}', 'success')
-            else:
-                flash('Link adicionado com sucesso, mas não foi possível detectar o preço.', 'warning')
-            
+            job_id = jobs.enqueue(link_id, product_url)
+            print(f"Link {link_id} cadastrado, job de scraping {job_id} enfileirado")
+            flash('Link adicionado com sucesso! Buscando o preço atual...', 'success')
             return redirect(url_for('index'))
             
         except ValueError as e:
@@ -293,40 +329,3 @@ def internal_server_error(e):
 def handle_exception(e):
     app.logger.error(f"Erro não tratado: {str(e)}")
     return render_template('500.html'), 500
-
-def background_update():
-    """
-    Executa a atualização em segundo plano
-    """
-    with app.app_context():
-        while True:
-            try:
-                print("Iniciando atualização automática...")
-                with get_db_connection() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute('''
-                        SELECT id, product_url
-                        FROM product_links
-                    ''')
-                    links = cursor.fetchall()
-                    
-                    for link in links:
-                        try:
-                            product_info = fetch_product_info(link['product_url'])
-                            if product_info['price']:
-                                log_price(link['id'], product_info['price'])
-                                print(f"✓ Preço atualizado para {link['product_url']}: R$ {product_info['price']:.2f}")
-                        except Exception as e:
-                            print(f"✗ Erro ao atualizar {link['product_url']}: {str(e)}")
-                            continue
-                
-                print("Atualização automática concluída!")
-                time.sleep(3600)  # 3600 segundos = 1 hora
-            except Exception as e:
-                print(f"Erro na atualização automática: {e}")
-                time.sleep(300)  # 5 minutos em caso de erro
-
-# Use em rotas pesadas
-@cache.cached(timeout=300)
-def rota_pesada():
-    pass
@@ -0,0 +1,101 @@
+"""
+Simula o agendamento adaptativo (refresh.check_interval) contra a cadência
+fixa de 1 hora: quantidade de buscas e atraso médio para detectar uma
+mudança de preço, em links com volatilidades diferentes. O atraso também é
+mostrado sem a primeira mudança de cada link: antes dela o link não tem
+como ser distinguido de um link estável.
+
+Uso: python benchmarks/bench_adaptive_refresh.py [links] [dias]
+Padrão: 1000 links x 60 dias.
+"""
+import os
+import sys
+import random
+from bisect import bisect_right
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import refresh
+
+# Fração dos links e intervalo médio entre mudanças de preço (horas);
+# None = preço que não muda no período
+VOLATILITY_MIX = ((0.05, 4), (0.15, 24), (0.30, 24 * 7), (0.50, None))
+
+
+def price_changes(mean_hours, total_hours, rng):
+    changes = []
+    if mean_hours is None:
+        return changes
+    t = rng.expovariate(1 / mean_hours)
+    while t < total_hours:
+        changes.append(t)
+        t += rng.expovariate(1 / mean_hours)
+    return changes
+
+
+def simulate(changes, total_hours, adaptive):
+    """
+    Retorna (buscas, atrasos de detecção, atrasos após a primeira mudança)
+    de um link
+    """
+    window = refresh.CHECK_WINDOW_DAYS * 24
+    checks = 0
+    delays = []
+    moving_delays = []
+    detected = []
+    last_version = 0
+    t = 0.0
+    while t < total_hours:
+        checks += 1
+        version = bisect_right(changes, t)
+        if version != last_version:
+            # Uma busca só vê a versão atual; mudanças intermediárias contam
+            # como detectadas no mesmo instante
+            delays.extend(t - c for c in changes[last_version:version])
+            moving_delays.extend(t - c for c in changes[max(last_version, 1):version])
+            detected.append(t)
+            last_version = version
+        if adaptive:
+            recent = sum(1 for d in detected if d >= t - window)
+            t += refresh.check_interval(recent, min(t, window))
+        else:
+            t += 1
+    return checks, delays, moving_delays
+
+
+def _mean(delays):
+    return f"{sum(delays) / len(delays):.2f}h" if delays else '-'
+
+
+def main(n_links=1000, days=60):
+    rng = random.Random(42)
+    total_hours = days * 24
+    classes = [
+        (mean_hours, [price_changes(mean_hours, total_hours, rng) for _ in range(int(n_links * fraction))])
+        for fraction, mean_hours in VOLATILITY_MIX
+    ]
+
+    for name, adaptive in (('fixo (1h)', False), ('adaptativo', True)):
+        total_checks = 0
+        summary = []
+        for mean_hours, links in classes:
+            checks = 0
+            delays = []
+            moving_delays = []
+            for changes in links:
+                link_checks, link_delays, link_moving_delays = simulate(changes, total_hours, adaptive)
+                checks += link_checks
+                delays += link_delays
+                moving_delays += link_moving_delays
+            total_checks += checks
+            label = f"muda a cada {mean_hours}h" if mean_hours else 'estável'
+            summary.append(
+                f"  {label:<20}{checks:>10} buscas  atraso médio {_mean(delays)}"
+                f" (após a 1ª mudança {_mean(moving_delays)})"
+            )
+        print(f"{name}: {total_checks} buscas")
+        print('\n'.join(summary))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
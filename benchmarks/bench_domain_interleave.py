@@ -0,0 +1,116 @@
+"""
+Simula um ciclo de atualização com distribuição de domínios desigual e
+compara o tempo total do RefreshEngine (rodízio entre domínios) com o
+envio na ordem da tabela, em que todos os links vão para o pool de threads
+de uma vez e cada worker espera a vaga do domínio do seu link.
+
+O scraping é simulado com sleep (latência fixa por domínio); os limites
+por domínio são os mesmos nos dois cenários (RefreshEngine.domain_limit).
+
+Uso: python benchmarks/bench_domain_interleave.py [links] [escala]
+Padrão: 400 links, escala 1.0 (latências de 20 a 80 ms).
+"""
+import os
+import sys
+import time
+import threading
+import concurrent.futures
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import refresh
+
+# Fração dos links e latência simulada (segundos) de cada loja
+DOMAIN_MIX = (
+    ('amazon.com.br', 0.45, 0.08),
+    ('mercadolivre.com.br', 0.25, 0.06),
+    ('magazineluiza.com.br', 0.10, 0.04),
+    ('kabum.com.br', 0.05, 0.03),
+    ('casasbahia.com.br', 0.05, 0.03),
+    ('americanas.com.br', 0.04, 0.03),
+    ('pichau.com.br', 0.03, 0.02),
+    ('terabyteshop.com.br', 0.03, 0.02),
+)
+
+
+def make_links(n_links):
+    """
+    Links agrupados por loja, como ficam na tabela quando o usuário cadastra
+    vários produtos da mesma loja em sequência
+    """
+    links = []
+    for domain, fraction, _ in DOMAIN_MIX:
+        for i in range(int(n_links * fraction)):
+            links.append({'id': f"{domain}-{i}", 'product_url': f"https://www.{domain}/p/{i}"})
+    return links
+
+
+def make_fetch(scale):
+    latency = {domain: seconds * scale for domain, _, seconds in DOMAIN_MIX}
+
+    def fetch(link):
+        time.sleep(latency[refresh.ratelimit.domain_of(link['product_url'])])
+        return {'price': 1.0}
+    return fetch
+
+
+def table_order_run(engine, links):
+    """
+    Comportamento anterior: submete tudo na ordem da tabela e limita o
+    domínio com um semáforo dentro do worker
+    """
+    slots = defaultdict(lambda: None)
+    lock = threading.Lock()
+
+    def run_one(link):
+        domain = refresh.ratelimit.domain_of(link['product_url'])
+        with lock:
+            if slots[domain] is None:
+                slots[domain] = threading.BoundedSemaphore(engine.domain_limit(domain))
+            slot = slots[domain]
+        with slot:
+            engine.fetch(link)
+
+    started = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=engine.max_workers) as executor:
+        for future in concurrent.futures.as_completed([executor.submit(run_one, link) for link in links]):
+            future.result()
+    return time.monotonic() - started
+
+
+def lower_bound(engine, links, scale):
+    """
+    Tempo mínimo possível: o maior entre o domínio mais carregado (com seu
+    limite de concorrência) e o trabalho total dividido entre os workers
+    """
+    latency = {domain: seconds * scale for domain, _, seconds in DOMAIN_MIX}
+    work = defaultdict(float)
+    for link in links:
+        domain = refresh.ratelimit.domain_of(link['product_url'])
+        work[domain] += latency[domain]
+    per_domain = max(seconds / engine.domain_limit(domain) for domain, seconds in work.items())
+    return max(per_domain, sum(work.values()) / engine.max_workers)
+
+
+def main(n_links=400, scale=1.0):
+    links = make_links(n_links)
+    engine = refresh.RefreshEngine(make_fetch(scale))
+    print(
+        f"{len(links)} links em {len(DOMAIN_MIX)} domínios, {engine.max_workers} workers, "
+        f"até {engine.max_per_domain} por domínio"
+    )
+    for domain, fraction, seconds in DOMAIN_MIX:
+        print(f"  {domain:<24}{int(n_links * fraction):>5} links  {seconds * scale * 1000:>4.0f} ms  limite {engine.domain_limit(domain)}")
+
+    table = table_order_run(engine, links)
+    stats = engine.run(links, lambda link, info, error: error is None)
+    bound = lower_bound(engine, links, scale)
+    print(f"ordem da tabela         {table:>8.2f}s")
+    print(f"rodízio por domínio     {stats['duration']:>8.2f}s  ({table / stats['duration']:.2f}x)")
+    print(f"limite teórico          {bound:>8.2f}s")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:3]
+    main(int(args[0]) if args else 400, float(args[1]) if len(args) > 1 else 1.0)
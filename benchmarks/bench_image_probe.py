@@ -0,0 +1,41 @@
+"""
+Compara o download completo com a sondagem de cabeçalho em get_image_resolution.
+
+Uso: python benchmarks/bench_image_probe.py URL [URL ...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scraper import probe_image, _download_image_size
+
+
+def measure(func, urls):
+    total_bytes = 0
+    latencies = []
+    for url in urls:
+        started = time.perf_counter()
+        try:
+            info = func(url)
+            total_bytes += info['bytes']
+        except Exception as e:
+            print(f"Erro em {url}: {e}")
+        latencies.append(time.perf_counter() - started)
+    return total_bytes, latencies
+
+
+def main(urls):
+    if not urls:
+        print(__doc__)
+        return
+    print(f"{'modo':<12}{'bytes':>14}{'tempo total':>14}{'média':>10}")
+    for name, func in (('completo', _download_image_size), ('cabeçalho', probe_image)):
+        total_bytes, latencies = measure(func, urls)
+        total = sum(latencies)
+        print(f"{name:<12}{total_bytes:>14}{total:>13.3f}s{total / len(urls):>9.3f}s")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
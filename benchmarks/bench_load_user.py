@@ -0,0 +1,64 @@
+"""
+Mede requisições/s em '/' para um usuário autenticado com e sem o cache de
+usuários do load_user (utils.get_user_by_id).
+
+Uso: python benchmarks/bench_load_user.py [requisições]
+Padrão: 2000 requisições por cenário.
+"""
+import os
+import sys
+import time
+import uuid
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Banco e cache do dashboard sintéticos em um diretório temporário
+_tmp = tempfile.mkdtemp()
+os.environ['DATABASE_PATH'] = os.path.join(_tmp, 'bench.db')
+os.environ['DASHBOARD_CACHE_DIR'] = os.path.join(_tmp, 'cache')
+os.environ.setdefault('SECRET_KEY', 'bench')
+
+import utils
+from app import app
+
+
+def populate():
+    utils.init_db()
+    user_id = str(uuid.uuid4())
+    with utils.get_db_connection() as conn:
+        conn.execute("INSERT INTO users (id, email, name) VALUES (?, ?, ?)", (user_id, 'bench@example.com', 'Bench'))
+        conn.commit()
+    product_id = utils.add_product('Produto', user_id)
+    link_id = utils.add_product_link(product_id, 'https://loja.com.br/produto', 'loja.com.br')
+    utils.log_price(link_id, 100.0)
+    return user_id
+
+
+def run(client, n_requests):
+    started = time.perf_counter()
+    for _ in range(n_requests):
+        response = client.get('/')
+        assert response.status_code == 200, response.status_code
+    return n_requests / (time.perf_counter() - started)
+
+
+def main(n_requests=2000):
+    user_id = populate()
+    app.config['TESTING'] = True
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = user_id
+        session['_fresh'] = True
+
+    # Aquece o cache do dashboard para medir só o custo do load_user
+    client.get('/')
+    for name, ttl in (('sem cache de usuário', 0), ('com cache de usuário', 60)):
+        utils.USER_CACHE_TTL = ttl
+        utils.invalidate_user_cache()
+        print(f"{name:<24}{run(client, n_requests):>10.0f} req/s")
+    print(f"Cache de usuários: {utils.get_user_cache_stats()}")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,75 @@
+"""
+Mede o tempo de parsing e o pico de memória de cada backend HTML sobre um
+diretório de páginas de lojas salvas (arquivos .html), com a árvore completa
+e com o SoupStrainer do modo só-preço.
+
+Uso: python benchmarks/bench_parsers.py DIRETORIO [repetições]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scraper import make_soup, extract_price, PRICE_STRAINER
+
+
+def available_parsers():
+    parsers = ['html.parser']
+    try:
+        import lxml  # noqa: F401
+        parsers.append('lxml')
+    except ImportError:
+        pass
+    return parsers
+
+
+def load_corpus(directory):
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(('.html', '.htm')):
+            with open(os.path.join(directory, name), 'rb') as f:
+                pages.append((name, f.read()))
+    return pages
+
+
+def measure(pages, parser, parse_only, repeat):
+    elapsed = 0.0
+    peak = 0
+    prices = 0
+    for _, content in pages:
+        for _ in range(repeat):
+            tracemalloc.start()
+            started = time.perf_counter()
+            soup = make_soup(content, parser=parser, parse_only=parse_only)
+            elapsed += time.perf_counter() - started
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        if extract_price(soup, ''):
+            prices += 1
+    return elapsed / repeat, peak, prices
+
+
+def main(directory, repeat=3):
+    pages = load_corpus(directory)
+    if not pages:
+        print(f"Nenhuma página .html encontrada em {directory}")
+        return
+    total_kb = sum(len(content) for _, content in pages) / 1024
+    print(f"{len(pages)} páginas, {total_kb:.0f} KB no total\n")
+    print(f"{'parser':<14}{'modo':<10}{'tempo':>10}{'ms/página':>12}{'pico MB':>10}{'preços':>8}")
+    for parser in available_parsers():
+        for mode, parse_only in (('completo', None), ('preço', PRICE_STRAINER)):
+            elapsed, peak, prices = measure(pages, parser, parse_only, repeat)
+            print(
+                f"{parser:<14}{mode:<10}{elapsed:>9.3f}s{elapsed / len(pages) * 1000:>12.1f}"
+                f"{peak / 1024 / 1024:>10.1f}{prices:>5}/{len(pages)}"
+            )
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+    else:
+        main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 3)
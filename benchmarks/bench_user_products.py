@@ -0,0 +1,137 @@
+"""
+Compara o carregamento do dashboard com a versão antiga (uma consulta
+GROUP_CONCAT por produto, com todo o histórico) sobre um usuário sintético,
+incluindo o tamanho dos dados enviados ao gráfico. A versão atual é
+get_user_products mais as páginas de get_link_history de cada link, que é
+o que a página carrega.
+
+Uso: python benchmarks/bench_user_products.py [produtos] [links] [pontos]
+Padrão: 200 produtos x 5 links x 10000 preços por link.
+"""
+import os
+import sys
+import time
+import uuid
+import json
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# O banco sintético fica em um diretório temporário
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+import utils
+
+
+def legacy_get_user_products(user_id):
+    """
+    Implementação anterior: N+1 consultas e parsing das strings do GROUP_CONCAT
+    """
+    with utils.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, product_name as name, created_at
+            FROM products
+            WHERE user_id = ?
+            ORDER BY created_at DESC
+        ''', (user_id,))
+        products = [dict(row) for row in cursor.fetchall()]
+        for product in products:
+            cursor.execute('''
+                SELECT pl.*,
+                       GROUP_CONCAT(ph.price) as prices,
+                       GROUP_CONCAT(ph.timestamp) as dates
+                FROM product_links pl
+                LEFT JOIN price_history ph ON pl.id = ph.link_id
+                WHERE pl.product_id = ?
+                GROUP BY pl.id
+            ''', (product['id'],))
+            links = []
+            for link in cursor.fetchall():
+                link_dict = dict(link)
+                prices = link_dict.get('prices')
+                dates = link_dict.get('dates')
+                if prices and dates:
+                    link_dict['price_data'] = {
+                        'prices': [float(p) for p in prices.split(',') if p],
+                        'dates': [d for d in dates.split(',') if d]
+                    }
+                else:
+                    link_dict['price_data'] = {'prices': [], 'dates': []}
+                links.append(link_dict)
+            product['links'] = links
+        return products
+
+
+def populate(n_products, n_links, n_points):
+    utils.init_db()
+    user_id = str(uuid.uuid4())
+    start = datetime(2024, 1, 1)
+    with utils.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO users (id, email, name) VALUES (?, ?, ?)", (user_id, 'bench@example.com', 'Bench'))
+        for p in range(n_products):
+            product_id = str(uuid.uuid4())
+            cursor.execute("INSERT INTO products (id, product_name, user_id) VALUES (?, ?, ?)", (product_id, f'Produto {p}', user_id))
+            for l in range(n_links):
+                link_id = str(uuid.uuid4())
+                cursor.execute(
+                    "INSERT INTO product_links (id, product_id, product_url, site_name) VALUES (?, ?, ?, ?)",
+                    (link_id, product_id, f'https://loja{l}.com.br/produto/{p}', f'Loja{l}')
+                )
+                price = random.uniform(100, 5000)
+                cursor.executemany(
+                    "INSERT INTO price_history (link_id, price, timestamp) VALUES (?, ?, ?)",
+                    (
+                        (link_id, round(price * random.uniform(0.9, 1.1), 2), (start + timedelta(hours=i)).strftime('%Y-%m-%d %H:%M:%S'))
+                        for i in range(n_points)
+                    )
+                )
+        # Os preços foram inseridos direto no histórico; gera os agregados
+        utils.rebuild_price_rollups(cursor)
+        conn.commit()
+    return user_id
+
+
+def current_get_user_products(user_id):
+    """
+    Dashboard atual: produtos e links, e o histórico de cada link pela API
+    paginada
+    """
+    products = utils.get_user_products(user_id)
+    for product in products:
+        for link in product['links']:
+            price_data = {'prices': [], 'dates': []}
+            since = None
+            while True:
+                page = utils.get_link_history(link['id'], user_id, since)
+                price_data['prices'] += page['prices']
+                price_data['dates'] += page['dates']
+                since = page['next_since']
+                if not since:
+                    break
+            link['price_data'] = price_data
+    return products
+
+
+def timed(func, user_id):
+    started = time.perf_counter()
+    products = func(user_id)
+    elapsed = time.perf_counter() - started
+    points = sum(len(link['price_data']['prices']) for product in products for link in product['links'])
+    payload = len(json.dumps([link['price_data'] for product in products for link in product['links']]))
+    return elapsed, points, payload
+
+
+def main(n_products=200, n_links=5, n_points=10000):
+    print(f"Gerando {n_products} produtos x {n_links} links x {n_points} preços em {utils.DB_PATH}...")
+    user_id = populate(n_products, n_links, n_points)
+    for name, func in (('GROUP_CONCAT (antigo)', legacy_get_user_products), ('paginado (atual)', current_get_user_products)):
+        elapsed, points, payload = timed(func, user_id)
+        print(f"{name:<24}{elapsed:>8.2f}s  {points} pontos  {payload / 1024:.0f} KB de dados do gráfico")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:4]))
@@ -0,0 +1,8 @@
+from utils import init_db, compact_price_history
+
+if __name__ == "__main__":
+    # Compactação única do histórico gravado antes do modo 'changes':
+    # preços repetidos em sequência viram uma faixa timestamp/last_seen
+    init_db()
+    removed = compact_price_history()
+    print(f"Compactação concluída: {removed} linhas repetidas removidas do histórico")
@@ -0,0 +1,120 @@
+import os
+import uuid
+import tempfile
+import threading
+from cachelib import FileSystemCache
+
+# Cache dos dados do dashboard compartilhado entre os workers do gunicorn
+# (e com o processo de atualização de preços, que invalida as entradas)
+DASHBOARD_CACHE_DIR = os.getenv('DASHBOARD_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'appscraper-cache'))
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', 600))
+DASHBOARD_CACHE_MAX_ENTRIES = int(os.getenv('DASHBOARD_CACHE_MAX_ENTRIES', 2000))
+
+_cache = None
+_cache_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def get_cache():
+    """
+    Retorna o backend do cache, criado na primeira chamada
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = FileSystemCache(
+                    DASHBOARD_CACHE_DIR,
+                    threshold=DASHBOARD_CACHE_MAX_ENTRIES,
+                    default_timeout=DASHBOARD_CACHE_TTL
+                )
+    return _cache
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+        _stats.update({'hits': 0, 'misses': 0, 'invalidations': 0, 'errors': 0})
+
+
+def get_stats():
+    """
+    Retorna uma cópia dos contadores deste processo com a taxa de acerto
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+    return stats
+
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+reset_stats()
+
+
+def _generation_key(user_id):
+    return f'dashboard-gen:{user_id}'
+
+
+def _generation(user_id):
+    """
+    Token da geração atual do usuário. Se a chave tiver sido removida (TTL
+    ou limite de entradas), cria um token novo: nunca volta a uma geração
+    anterior, então dados antigos ainda no cache não são mais lidos.
+    """
+    cache = get_cache()
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, timeout=DASHBOARD_CACHE_TTL * 2)
+        generation = cache.get(key)
+    return generation
+
+
+def get_or_compute(user_id, compute):
+    """
+    Retorna (dados, acertou) do dashboard do usuário, calculando com
+    compute() em caso de falta. A chave inclui a geração do usuário, lida
+    antes do cálculo: uma invalidação concorrente muda a geração e o valor
+    antigo gravado por este cálculo nunca mais é lido.
+    """
+    try:
+        generation = _generation(user_id)
+        key = f'dashboard:{user_id}:{generation}'
+        data = get_cache().get(key)
+    except Exception as e:
+        print(f"Erro ao ler cache do dashboard: {e}")
+        _count('errors')
+        return compute(), False
+
+    if data is not None:
+        _count('hits')
+        return data, True
+
+    _count('misses')
+    data = compute()
+    try:
+        get_cache().set(key, data)
+    except Exception as e:
+        print(f"Erro ao gravar cache do dashboard: {e}")
+        _count('errors')
+    return data, False
+
+
+def invalidate(user_ids):
+    """
+    Invalida o dashboard dos usuários avançando a geração de cada um
+    """
+    for user_id in set(user_ids):
+        try:
+            # Token único por geração; dados de gerações antigas saem pelo TTL
+            get_cache().set(_generation_key(user_id), uuid.uuid4().hex, timeout=DASHBOARD_CACHE_TTL * 2)
+            _count('invalidations')
+        except Exception as e:
+            print(f"Erro ao invalidar cache do dashboard: {e}")
+            _count('errors')
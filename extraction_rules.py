@@ -0,0 +1,169 @@
+import os
+import json
+import threading
+from datetime import datetime
+from utils import get_db_connection
+
+# Arquivo opcional com regras por domínio, no formato
+# {"dominio.com.br": {"price_selector": "...", "image_selector": "...", "locale": "pt_BR"}}
+EXTRACTION_RULES_FILE = os.getenv('EXTRACTION_RULES_FILE', 'extraction_rules.json')
+
+DEFAULT_LOCALE = 'pt_BR'
+
+# Regras conhecidas das principais lojas
+DEFAULT_RULES = {
+    'apple.com': {'price_selector': 'span.rc-prices-fullprice[data-autom="full-price"]'},
+    'mercadolivre.com.br': {'price_selector': 'span.price-tag-fraction'},
+    'amazon.com.br': {'price_selector': 'span.a-price-whole', 'image_selector': '#landingImage'},
+    'magazineluiza.com.br': {'price_selector': 'p.price-template__text'},
+    'americanas.com.br': {'price_selector': 'div.priceSales'},
+}
+
+RULE_FIELDS = ('price_selector', 'image_selector', 'locale')
+
+# Falhas seguidas antes de descartar um seletor aprendido
+RULE_MAX_MISSES = int(os.getenv('RULE_MAX_MISSES', 3))
+
+_lock = threading.Lock()
+_configured = None
+_learned = None
+_misses = {}
+
+
+def normalize_domain(domain):
+    """
+    Remove porta e 'www.' do domínio
+    """
+    domain = domain.lower().split(':')[0]
+    return domain[4:] if domain.startswith('www.') else domain
+
+
+def load_config(path=None):
+    """
+    Carrega as regras padrão combinadas com as do arquivo de configuração
+    """
+    rules = {domain: dict(rule) for domain, rule in DEFAULT_RULES.items()}
+    path = path or EXTRACTION_RULES_FILE
+    if path and os.path.exists(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                for domain, rule in json.load(f).items():
+                    rules.setdefault(normalize_domain(domain), {}).update(
+                        {field: rule[field] for field in RULE_FIELDS if rule.get(field)}
+                    )
+        except (OSError, ValueError) as e:
+            print(f"Erro ao carregar regras de extração de {path}: {e}")
+    return rules
+
+
+def _load_learned():
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT domain, price_selector, image_selector, locale FROM extraction_rules')
+        return {
+            row['domain']: {field: row[field] for field in RULE_FIELDS if row[field]}
+            for row in cursor.fetchall()
+        }
+
+
+def _ensure_loaded():
+    global _configured, _learned
+    if _learned is None:
+        with _lock:
+            if _learned is None:
+                _configured = load_config()
+                _learned = _load_learned()
+
+
+def _lookup(rules, domain):
+    """
+    Procura a regra do domínio ou de um domínio pai (ex.: loja.apple.com -> apple.com)
+    """
+    parts = domain.split('.')
+    for i in range(max(len(parts) - 1, 1)):
+        rule = rules.get('.'.join(parts[i:]))
+        if rule:
+            return rule
+    return {}
+
+
+def get_rule(domain):
+    """
+    Retorna a regra efetiva do domínio: o seletor aprendido tem prioridade
+    sobre o configurado, e a localidade padrão é pt_BR
+    """
+    _ensure_loaded()
+    domain = normalize_domain(domain)
+    with _lock:
+        rule = dict(_lookup(_configured, domain))
+        rule.update(_lookup(_learned, domain))
+    rule.setdefault('locale', DEFAULT_LOCALE)
+    return rule
+
+
+def record_success(domain, **selectors):
+    """
+    Registra o seletor que funcionou para o domínio (price_selector e/ou
+    image_selector), persistindo só quando ele muda
+    """
+    _ensure_loaded()
+    domain = normalize_domain(domain)
+    selectors = {field: value for field, value in selectors.items() if field in RULE_FIELDS and value}
+    with _lock:
+        for field in selectors:
+            _misses.pop((domain, field), None)
+        current = _learned.get(domain, {})
+        if all(current.get(field) == value for field, value in selectors.items()):
+            return
+        learned = dict(current, **selectors)
+        _learned[domain] = learned
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO extraction_rules (domain, price_selector, image_selector, locale, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (domain, learned.get('price_selector'), learned.get('image_selector'), learned.get('locale'), datetime.utcnow()))
+        conn.commit()
+
+
+def record_hit(domain, field):
+    """
+    O seletor do domínio funcionou: zera a contagem de falhas
+    """
+    with _lock:
+        _misses.pop((normalize_domain(domain), field), None)
+
+
+def record_miss(domain, field):
+    """
+    O seletor do domínio não encontrou nada nesta página. Só é descartado
+    após RULE_MAX_MISSES falhas seguidas. Retorna True se foi descartado.
+    """
+    key = (normalize_domain(domain), field)
+    with _lock:
+        _misses[key] = _misses.get(key, 0) + 1
+        if _misses[key] < RULE_MAX_MISSES:
+            return False
+        del _misses[key]
+    forget(domain, field)
+    return True
+
+
+def forget(domain, field):
+    """
+    Descarta um seletor aprendido que deixou de funcionar
+    """
+    _ensure_loaded()
+    domain = normalize_domain(domain)
+    with _lock:
+        learned = _learned.get(domain)
+        if field not in RULE_FIELDS or not learned or field not in learned:
+            return
+        learned = {key: value for key, value in learned.items() if key != field}
+        _learned[domain] = learned
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'UPDATE extraction_rules SET {field} = NULL, updated_at = ? WHERE domain = ?', (datetime.utcnow(), domain))
+        conn.commit()
@@ -0,0 +1,104 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import ratelimit
+
+# Timeouts padrão (conexão, leitura) em segundos
+CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 20))
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+# Tamanho do pool: quantos hosts ficam em cache e quantas conexões por host
+POOL_HOSTS = int(os.getenv('HTTP_POOL_HOSTS', 50))
+POOL_PER_HOST = int(os.getenv('HTTP_POOL_PER_HOST', 4))
+
+# Retentativas com backoff exponencial em erros 5xx transitórios. 429 e 503
+# ficam com o ratelimit, que aplica o backoff ao domínio inteiro: o urllib3
+# não pode retentar nem dormir pelo Retry-After segurando a vaga do domínio
+MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', 3))
+BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', 0.5))
+RETRY_STATUSES = (500, 502, 504)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8'
+}
+
+# Brotli só é anunciado se o urllib3 conseguir decodificá-lo
+try:
+    import brotli  # noqa: F401
+    DEFAULT_HEADERS['Accept-Encoding'] = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        DEFAULT_HEADERS['Accept-Encoding'] = 'gzip, deflate, br'
+    except ImportError:
+        DEFAULT_HEADERS['Accept-Encoding'] = 'gzip, deflate'
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _build_session():
+    """
+    Cria a sessão com pool de conexões keep-alive e política de retentativas
+    """
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=False,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=POOL_HOSTS,
+        pool_maxsize=POOL_PER_HOST,
+        pool_block=True,
+        max_retries=retry
+    )
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    """
+    Retorna a sessão HTTP compartilhada pelo processo
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def request(method, url, **kwargs):
+    """
+    Executa uma requisição pela sessão compartilhada, sempre com timeout e
+    respeitando o limite de taxa do domínio. Levanta ratelimit.Blocked se o
+    site limitar as requisições ou devolver uma página de bloqueio.
+    """
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    with ratelimit.slot(url) as limiter:
+        response = get_session().request(method, url, **kwargs)
+    try:
+        ratelimit.observe(limiter, response, check_body=not kwargs.get('stream'))
+    except ratelimit.Blocked:
+        response.close()
+        raise
+    return response
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def head(url, **kwargs):
+    kwargs.setdefault('allow_redirects', True)
+    return request('HEAD', url, **kwargs)
@@ -0,0 +1,79 @@
+import os
+from datetime import datetime, timedelta
+from utils import get_db_connection
+
+# Por quanto tempo a medição de uma imagem é considerada válida
+IMAGE_CACHE_TTL = timedelta(days=int(os.getenv('IMAGE_CACHE_TTL_DAYS', 30)))
+# Número máximo de imagens guardadas; as menos usadas são removidas primeiro
+IMAGE_CACHE_MAX_ENTRIES = int(os.getenv('IMAGE_CACHE_MAX_ENTRIES', 20000))
+
+
+def get_many(image_urls):
+    """
+    Retorna {image_url: metadados} para as URLs com medição ainda válida e
+    marca essas entradas como usadas agora
+    """
+    if not image_urls:
+        return {}
+    now = datetime.utcnow()
+    placeholders = ','.join('?' * len(image_urls))
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT image_url, width, height, bytes, content_type, probed_at
+            FROM image_cache
+            WHERE image_url IN ({placeholders}) AND probed_at >= ?
+        ''', (*image_urls, now - IMAGE_CACHE_TTL))
+        found = {row['image_url']: dict(row) for row in cursor.fetchall()}
+
+        if found:
+            cursor.executemany(
+                'UPDATE image_cache SET last_used_at = ? WHERE image_url = ?',
+                [(now, url) for url in found]
+            )
+            conn.commit()
+        return found
+
+
+def save(image_url, info):
+    """
+    Guarda as dimensões medidas de uma imagem e aplica o limite de tamanho
+    """
+    save_many({image_url: info})
+
+
+def save_many(measured):
+    """
+    Guarda {image_url: metadados} em uma única transação e aplica o limite
+    de tamanho
+    """
+    if not measured:
+        return
+    now = datetime.utcnow()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT OR REPLACE INTO image_cache
+            (image_url, width, height, bytes, content_type, probed_at, last_used_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (image_url, info['width'], info['height'], info.get('bytes'), info.get('content_type'), now, now)
+            for image_url, info in measured.items()
+        ])
+        _evict(cursor)
+        conn.commit()
+
+
+def _evict(cursor):
+    """
+    Remove entradas expiradas e, acima do limite, as usadas há mais tempo
+    """
+    cursor.execute('DELETE FROM image_cache WHERE probed_at < ?', (datetime.utcnow() - IMAGE_CACHE_TTL,))
+    cursor.execute('''
+        DELETE FROM image_cache
+        WHERE image_url IN (
+            SELECT image_url FROM image_cache
+            ORDER BY last_used_at DESC
+            LIMIT -1 OFFSET ?
+        )
+    ''', (IMAGE_CACHE_MAX_ENTRIES,))
@@ -0,0 +1,203 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from utils import get_db_connection, log_price, invalidate_link_dashboards
+import ratelimit
+
+# Fila de scraping persistida no SQLite. Os workers do gunicorn só
+# enfileiram; quem processa são as threads do worker.py (o UPDATE ...
+# RETURNING garante que só uma pega cada job). Job enfileirado pelo web é
+# encontrado em até JOB_POLL_SECONDS.
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', 2))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+# Espera antes de tentar de novo: dobra a cada tentativa, até o máximo, e
+# nunca é menor que o backoff do domínio quando o site bloqueou a requisição
+JOB_RETRY_BASE_SECONDS = float(os.getenv('JOB_RETRY_BASE_SECONDS', 60))
+JOB_RETRY_MAX_SECONDS = float(os.getenv('JOB_RETRY_MAX_SECONDS', 1800))
+# Jobs 'running' há mais tempo que isso são de um worker que morreu
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', 600))
+
+JOB_STATUSES = ('pending', 'running', 'done', 'failed')
+
+_workers_lock = threading.Lock()
+_workers_pid = None
+_wakeup = threading.Event()
+
+
+def enqueue(link_id, product_url):
+    """
+    Cria um job de scraping para o link e retorna seu id
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO scrape_jobs (link_id, product_url, status, attempts, created_at)
+            VALUES (?, ?, 'pending', 0, ?)
+        ''', (link_id, product_url, datetime.utcnow()))
+        conn.commit()
+        job_id = cursor.lastrowid
+    invalidate_link_dashboards([link_id])
+    # Acorda as threads se o job foi criado no próprio worker.py; no web
+    # não há threads e o worker.py acha o job na próxima consulta
+    _wakeup.set()
+    return job_id
+
+
+def get_job(job_id, user_id):
+    """
+    Retorna o estado do job se o link for do usuário, senão None
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT j.id, j.link_id, j.status, j.attempts, j.error, j.price,
+                   j.created_at, j.started_at, j.finished_at, j.not_before
+            FROM scrape_jobs j
+            JOIN product_links pl ON j.link_id = pl.id
+            JOIN products p ON pl.product_id = p.id
+            WHERE j.id = ? AND p.user_id = ?
+        ''', (job_id, user_id))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+
+
+def requeue_stale():
+    """
+    Devolve à fila jobs que ficaram 'running' por um worker interrompido
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE scrape_jobs
+            SET status = 'pending'
+            WHERE status = 'running' AND started_at < ?
+        ''', (datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS),))
+        conn.commit()
+        return cursor.rowcount
+
+
+def claim():
+    """
+    Marca o job pendente mais antigo que já pode rodar (not_before vencido)
+    como 'running' e o retorna (ou None)
+    """
+    now = datetime.utcnow()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE scrape_jobs
+            SET status = 'running', started_at = ?, attempts = attempts + 1
+            WHERE id = (
+                SELECT id FROM scrape_jobs
+                WHERE status = 'pending' AND (not_before IS NULL OR not_before <= ?)
+                ORDER BY id
+                LIMIT 1
+            )
+            RETURNING id, link_id, product_url, attempts
+        ''', (now, now))
+        row = cursor.fetchone()
+        conn.commit()
+        return dict(row) if row else None
+
+
+def retry_delay(attempts, error=None):
+    """
+    Segundos até a próxima tentativa de um job que falhou attempts vezes
+    """
+    delay = min(JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), JOB_RETRY_MAX_SECONDS)
+    if isinstance(error, ratelimit.Blocked) and error.retry_after:
+        delay = max(delay, error.retry_after)
+    return delay
+
+
+def _finish(job, status, error=None, price=None, not_before=None):
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE scrape_jobs
+            SET status = ?, error = ?, price = ?, finished_at = ?, not_before = ?
+            WHERE id = ?
+        ''', (status, error, price, datetime.utcnow() if status in ('done', 'failed') else None, not_before, job['id']))
+        conn.commit()
+    invalidate_link_dashboards([job['link_id']])
+
+
+def process(job, fetch=None):
+    """
+    Faz o scraping do link do job, grava imagem/favicon/logo e o preço
+    inicial. Em caso de erro o job volta para a fila até JOB_MAX_ATTEMPTS.
+    """
+    if fetch is None:
+        from scraper import fetch_product_info as fetch
+    try:
+        product_info = fetch(job['product_url'])
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            now = datetime.utcnow()
+            cursor.execute('''
+                UPDATE product_links
+                SET image_url = ?, favicon_url = ?, logo_url = ?, last_update = ?, metadata_updated_at = ?
+                WHERE id = ?
+            ''', (
+                product_info.get('image_url'),
+                product_info.get('favicon_url'),
+                product_info.get('logo_url'),
+                now,
+                now,
+                job['link_id']
+            ))
+            conn.commit()
+            if cursor.rowcount == 0:
+                # O link foi removido enquanto o job rodava
+                print(f"Job {job['id']} descartado: link removido")
+                return
+        price = product_info.get('price')
+        if price:
+            log_price(job['link_id'], price)
+            _finish(job, 'done', price=price)
+        else:
+            _finish(job, 'done', error='Preço não encontrado')
+        print(f"✓ Job {job['id']} concluído: {job['product_url']}")
+    except Exception as e:
+        print(f"✗ Job {job['id']} falhou (tentativa {job['attempts']}): {e}")
+        if job['attempts'] >= JOB_MAX_ATTEMPTS:
+            _finish(job, 'failed', error=str(e))
+            return
+        not_before = datetime.utcnow() + timedelta(seconds=retry_delay(job['attempts'], e))
+        _finish(job, 'pending', error=str(e), not_before=not_before)
+
+
+def _worker_loop():
+    while True:
+        try:
+            job = claim()
+        except Exception as e:
+            print(f"Erro ao buscar job de scraping: {e}")
+            job = None
+        if job:
+            process(job)
+            continue
+        _wakeup.wait(JOB_POLL_SECONDS)
+        _wakeup.clear()
+
+
+def ensure_workers():
+    """
+    Inicia as threads de processamento neste processo, uma única vez por
+    pid. Chamado só pelo worker.py, nunca pelos workers do gunicorn
+    """
+    global _workers_pid
+    pid = os.getpid()
+    if _workers_pid == pid or JOB_WORKERS <= 0:
+        return
+    with _workers_lock:
+        if _workers_pid == pid:
+            return
+        _workers_pid = pid
+        try:
+            requeue_stale()
+        except Exception as e:
+            print(f"Erro ao reenfileirar jobs interrompidos: {e}")
+        for i in range(JOB_WORKERS):
+            threading.Thread(target=_worker_loop, name=f'scrape-job-{i}', daemon=True).start()
@@ -0,0 +1,70 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from utils import get_db_connection
+
+# Tempo de validade do favicon/logo de um domínio
+SITE_LOGO_TTL = timedelta(hours=int(os.getenv('SITE_LOGO_TTL_HOURS', 24 * 7)))
+
+# Cache em memória: domínio -> {'favicon_url', 'logo_url', 'updated_at'}
+_memory = {}
+_lock = threading.Lock()
+
+
+def _is_fresh(entry):
+    return entry is not None and datetime.utcnow() - entry['updated_at'] < SITE_LOGO_TTL
+
+
+def get(domain):
+    """
+    Retorna {'favicon_url', 'logo_url'} do domínio se ainda válido, consultando
+    primeiro a memória e depois o SQLite
+    """
+    domain = domain.lower()
+    with _lock:
+        entry = _memory.get(domain)
+    if _is_fresh(entry):
+        return {'favicon_url': entry['favicon_url'], 'logo_url': entry['logo_url']}
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT favicon_url, logo_url, updated_at
+            FROM site_logos
+            WHERE domain = ?
+        ''', (domain,))
+        row = cursor.fetchone()
+
+    if not row:
+        return None
+    entry = {
+        'favicon_url': row['favicon_url'],
+        'logo_url': row['logo_url'],
+        'updated_at': datetime.fromisoformat(str(row['updated_at']))
+    }
+    if not _is_fresh(entry):
+        return None
+    with _lock:
+        _memory[domain] = entry
+    return {'favicon_url': entry['favicon_url'], 'logo_url': entry['logo_url']}
+
+
+def save(domain, site_logos):
+    """
+    Guarda o favicon/logo do domínio na memória e no SQLite
+    """
+    domain = domain.lower()
+    entry = {
+        'favicon_url': site_logos['favicon_url'],
+        'logo_url': site_logos['logo_url'],
+        'updated_at': datetime.utcnow()
+    }
+    with _lock:
+        _memory[domain] = entry
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO site_logos (domain, favicon_url, logo_url, updated_at)
+            VALUES (?, ?, ?, ?)
+        ''', (domain, entry['favicon_url'], entry['logo_url'], entry['updated_at']))
+        conn.commit()
@@ -0,0 +1,158 @@
+from datetime import datetime
+from utils import get_db_connection, rebuild_price_rollups
+
+
+def add_column(table, column, definition):
+    """
+    Migração que adiciona uma coluna apenas se ela ainda não existir
+    (bancos antigos podem já ter recebido a coluna manualmente)
+    """
+    def migrate(cursor):
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return migrate
+
+
+# Migrações em ordem. Cada uma é (versão, descrição, passos), onde um passo é
+# um comando SQL ou uma função que recebe o cursor. Nunca altere uma migração
+# já publicada: crie uma nova versão.
+MIGRATIONS = [
+    (1, 'Índices das consultas de links e histórico', [
+        'CREATE INDEX IF NOT EXISTS idx_products_user ON products(user_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_product_links_product ON product_links(product_id)',
+        'CREATE INDEX IF NOT EXISTS idx_price_history_link_ts ON price_history(link_id, timestamp)',
+    ]),
+    (2, 'Coluna last_update em product_links', [
+        add_column('product_links', 'last_update', 'TIMESTAMP'),
+    ]),
+    (3, 'Coluna last_seen em price_history (armazenamento só de mudanças)', [
+        add_column('price_history', 'last_seen', 'TIMESTAMP'),
+    ]),
+    (4, 'Agregados diários e semanais de preço (price_rollups)', [
+        '''
+        CREATE TABLE IF NOT EXISTS price_rollups (
+            link_id TEXT NOT NULL,
+            resolution TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            min_price REAL NOT NULL,
+            max_price REAL NOT NULL,
+            last_price REAL NOT NULL,
+            last_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (link_id, resolution, bucket)
+        ) WITHOUT ROWID
+        ''',
+        rebuild_price_rollups,
+    ]),
+    (5, 'Fila de jobs de scraping (scrape_jobs)', [
+        '''
+        CREATE TABLE IF NOT EXISTS scrape_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            link_id TEXT NOT NULL,
+            product_url TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            price REAL,
+            created_at TIMESTAMP NOT NULL,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_scrape_jobs_status ON scrape_jobs(status, id)',
+        'CREATE INDEX IF NOT EXISTS idx_scrape_jobs_link ON scrape_jobs(link_id, id)',
+    ]),
+    (6, 'Leases do agendador (scheduler_leases)', [
+        '''
+        CREATE TABLE IF NOT EXISTS scheduler_leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT,
+            expires_at REAL NOT NULL DEFAULT 0,
+            last_started_at REAL,
+            last_finished_at REAL
+        )
+        ''',
+    ]),
+    (7, 'Próxima verificação por link (next_check_at)', [
+        add_column('product_links', 'next_check_at', 'TIMESTAMP'),
+        'CREATE INDEX IF NOT EXISTS idx_product_links_next_check ON product_links(next_check_at)',
+    ]),
+    (8, 'Espera entre tentativas de jobs de scraping (not_before)', [
+        add_column('scrape_jobs', 'not_before', 'TIMESTAMP'),
+    ]),
+    (9, 'Data da última busca de metadados dos links (metadata_updated_at)', [
+        add_column('product_links', 'metadata_updated_at', 'TIMESTAMP'),
+        # Links que já têm imagem e favicon contam a partir da última atualização
+        '''
+        UPDATE product_links SET metadata_updated_at = last_update
+        WHERE metadata_updated_at IS NULL AND image_url IS NOT NULL AND favicon_url IS NOT NULL
+        ''',
+    ]),
+]
+
+
+def get_schema_version(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL
+        )
+    ''')
+    cursor.execute('SELECT MAX(version) FROM schema_version')
+    return cursor.fetchone()[0] or 0
+
+
+def schema_is_current(cursor):
+    """
+    Indica se todas as migrações já foram aplicadas (uma única leitura,
+    sem lock de escrita)
+    """
+    return get_schema_version(cursor) >= MIGRATIONS[-1][0]
+
+
+def apply_migrations(conn=None):
+    """
+    Aplica, em ordem e cada uma em sua transação, as migrações ainda não
+    registradas em schema_version. BEGIN IMMEDIATE serializa processos que
+    sobem ao mesmo tempo (workers do gunicorn); com o banco em dia nenhum
+    lock é pedido. Retorna as versões aplicadas.
+    """
+    if conn is None:
+        with get_db_connection() as conn:
+            return apply_migrations(conn)
+
+    applied = []
+    cursor = conn.cursor()
+    current = get_schema_version(cursor)
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+        if conn.in_transaction:
+            conn.commit()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            if version <= get_schema_version(cursor):
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            cursor.execute(
+                'INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)',
+                (version, description, datetime.utcnow())
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"Migração {version} aplicada: {description}")
+        applied.append(version)
+    return applied
+
+
+if __name__ == '__main__':
+    from utils import init_db
+    init_db()
@@ -0,0 +1,149 @@
+import hashlib
+import threading
+from datetime import datetime
+from utils import get_db_connection
+
+# Campos do resultado do scraping que ficam guardados junto com os validadores
+CACHED_FIELDS = ('price', 'image_url', 'site_name', 'favicon_url', 'logo_url')
+
+_stats_lock = threading.Lock()
+_stats = {}
+
+
+def reset_stats():
+    """
+    Zera os contadores do cache (chamado no início de cada atualização)
+    """
+    with _stats_lock:
+        _stats.clear()
+        _stats.update({
+            'requests': 0,
+            'not_modified': 0,
+            'unchanged_body': 0,
+            'misses': 0,
+            'bytes_downloaded': 0,
+            'bytes_saved': 0
+        })
+
+
+def get_stats():
+    """
+    Retorna uma cópia dos contadores com a taxa de acerto calculada
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    hits = stats['not_modified'] + stats['unchanged_body']
+    stats['hit_rate'] = hits / stats['requests'] if stats['requests'] else 0.0
+    return stats
+
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+reset_stats()
+
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def load(product_url):
+    """
+    Busca os validadores e o último resultado salvo para a URL
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM page_cache WHERE product_url = ?', (product_url,))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+
+
+def is_usable(entry, required_fields=('price',)):
+    """
+    Indica se a entrada tem todos os campos de que o chamador precisa
+    """
+    return bool(entry) and all(entry[field] for field in required_fields)
+
+
+def conditional_headers(entry, required_fields=('price',)):
+    """
+    Monta os cabeçalhos If-None-Match / If-Modified-Since para a requisição.
+    Sem uma entrada utilizável não há validadores, já que um 304 não traria
+    o corpo necessário para o scraping.
+    """
+    headers = {}
+    if is_usable(entry, required_fields):
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def cached_result(entry):
+    """
+    Reconstrói o resultado do scraping a partir da entrada do cache
+    """
+    return {field: entry[field] for field in CACHED_FIELDS}
+
+
+def lookup(product_url, response, entry, required_fields=('price',)):
+    """
+    Decide se a resposta pode ser atendida pelo cache. Retorna o resultado
+    salvo ou None quando a página precisa ser processada. required_fields
+    lista os campos que a entrada precisa ter para servir ao chamador.
+    """
+    _count('requests')
+    usable = is_usable(entry, required_fields)
+    if usable and response.status_code == 304:
+        _count('not_modified')
+        _count('bytes_saved', entry['content_length'] or 0)
+        return cached_result(entry)
+
+    _count('bytes_downloaded', len(response.content))
+    if usable and entry['content_hash'] == content_hash(response.content):
+        _count('unchanged_body')
+        return cached_result(entry)
+
+    _count('misses')
+    return None
+
+
+def save(product_url, response, product_info, fields=CACHED_FIELDS):
+    """
+    Salva os validadores da resposta e o resultado extraído da página.
+    Só os campos em fields são sobrescritos; os demais mantêm o valor
+    anterior, para que um scraping só de preço não apague a imagem salva.
+    """
+    if response.status_code != 200:
+        return
+    assignments = ',\n'.join(
+        f'{field} = excluded.{field}' if field in fields else f'{field} = {field}'
+        for field in CACHED_FIELDS
+    )
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            INSERT INTO page_cache
+            (product_url, etag, last_modified, content_hash, content_length,
+             price, image_url, site_name, favicon_url, logo_url, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(product_url) DO UPDATE SET
+                etag = excluded.etag,
+                last_modified = excluded.last_modified,
+                content_hash = excluded.content_hash,
+                content_length = excluded.content_length,
+                updated_at = excluded.updated_at,
+                {assignments}
+        ''', (
+            product_url,
+            response.headers.get('ETag'),
+            response.headers.get('Last-Modified'),
+            content_hash(response.content),
+            len(response.content),
+            *(product_info.get(field) for field in CACHED_FIELDS),
+            datetime.utcnow()
+        ))
+        conn.commit()
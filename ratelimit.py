@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import random
+import threading
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import requests
+
+# Limites padrão por domínio: requisições por segundo, rajada do token
+# bucket, requisições simultâneas e variação aleatória no espaçamento
+# (fração do intervalo entre requisições)
+RATE_LIMIT_PER_SECOND = float(os.getenv('RATE_LIMIT_PER_SECOND', 1.0))
+RATE_LIMIT_BURST = float(os.getenv('RATE_LIMIT_BURST', 3))
+RATE_LIMIT_CONCURRENCY = int(os.getenv('RATE_LIMIT_CONCURRENCY', 2))
+RATE_LIMIT_JITTER = float(os.getenv('RATE_LIMIT_JITTER', 0.3))
+
+# Limites específicos, no formato
+# {"amazon.com.br": {"rate": 0.2, "burst": 1, "concurrency": 1}}
+RATE_LIMITS = json.loads(os.getenv('RATE_LIMITS', '{}'))
+DEFAULT_DOMAIN_LIMITS = {
+    'amazon.com.br': {'rate': 0.3, 'burst': 2, 'concurrency': 1},
+    'mercadolivre.com.br': {'rate': 0.5, 'burst': 2, 'concurrency': 1},
+}
+
+# Backoff após 429/503 ou página de bloqueio sem Retry-After: dobra a cada
+# ocorrência seguida, até o máximo
+BACKOFF_BASE_SECONDS = float(os.getenv('RATE_LIMIT_BACKOFF_BASE', 30))
+BACKOFF_MAX_SECONDS = float(os.getenv('RATE_LIMIT_BACKOFF_MAX', 900))
+# Se o domínio estiver bloqueado por mais que isso, a requisição falha na
+# hora em vez de prender a thread esperando
+MAX_WAIT_SECONDS = float(os.getenv('RATE_LIMIT_MAX_WAIT', 30))
+
+THROTTLE_STATUSES = (429, 503)
+
+# Trechos (em minúsculas) que identificam páginas de CAPTCHA/bloqueio
+BLOCK_PAGE_MARKERS = (
+    b'/errors/validatecaptcha',
+    b'<title>robot check</title>',
+    b'px-captcha',
+    b'<title>just a moment...</title>',
+    b'<title>access denied</title>',
+    b'cf-chl-bypass',
+)
+BLOCK_PAGE_SCAN_BYTES = 64 * 1024
+
+
+class Blocked(requests.RequestException):
+    """
+    O site limitou ou bloqueou as requisições (429/503, CAPTCHA ou domínio
+    ainda em backoff). retry_after é o tempo restante do backoff do domínio.
+    """
+
+    def __init__(self, *args, retry_after=None, **kwargs):
+        self.retry_after = retry_after
+        super().__init__(*args, **kwargs)
+
+
+def domain_of(url):
+    domain = (urlparse(url).hostname or '').lower()
+    return domain[4:] if domain.startswith('www.') else domain
+
+
+def _limits_for(domain):
+    limits = {'rate': RATE_LIMIT_PER_SECOND, 'burst': RATE_LIMIT_BURST, 'concurrency': RATE_LIMIT_CONCURRENCY}
+    parts = domain.split('.')
+    # A regra do domínio pai vale para os subdomínios (ex.: m.media-amazon.com)
+    for i in range(len(parts) - 1, -1, -1):
+        parent = '.'.join(parts[i:])
+        limits.update(DEFAULT_DOMAIN_LIMITS.get(parent, {}))
+        limits.update(RATE_LIMITS.get(parent, {}))
+    return limits
+
+
+def retry_after_seconds(response):
+    """
+    Lê o cabeçalho Retry-After (segundos ou data HTTP)
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_block_page(response):
+    content_type = response.headers.get('Content-Type', '')
+    if response.status_code != 200 or 'html' not in content_type:
+        return False
+    head = response.content[:BLOCK_PAGE_SCAN_BYTES].lower()
+    return any(marker in head for marker in BLOCK_PAGE_MARKERS)
+
+
+class DomainLimiter:
+    """
+    Token bucket de um domínio, com limite de concorrência e backoff
+    """
+
+    def __init__(self, domain, rate, burst, concurrency):
+        self.domain = domain
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = max(int(concurrency), 1)
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.failures = 0
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(self.concurrency)
+        self.stats = {
+            'requests': 0,
+            'throttled': 0,
+            'block_pages': 0,
+            'rejected': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+        }
+
+    def reserve(self):
+        """
+        Reserva um token e retorna quantos segundos esperar por ele. Os
+        tokens podem ficar negativos: cada chamada recebe a sua vez na fila.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            blocked = max(self.blocked_until - now, 0.0)
+            if blocked > MAX_WAIT_SECONDS:
+                self.stats['rejected'] += 1
+                raise Blocked(f"{self.domain} em backoff por mais {blocked:.0f}s", retry_after=blocked)
+            self.tokens -= 1
+            wait = max(-self.tokens / self.rate, blocked)
+            if wait > 0:
+                wait += random.uniform(0, RATE_LIMIT_JITTER / self.rate)
+                self.stats['waits'] += 1
+                self.stats['wait_seconds'] += wait
+            self.stats['requests'] += 1
+            return wait
+
+    def back_off(self, seconds=None):
+        with self.lock:
+            self.failures += 1
+            if seconds is None:
+                seconds = min(BACKOFF_BASE_SECONDS * 2 ** (self.failures - 1), BACKOFF_MAX_SECONDS)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            return seconds
+
+    def succeeded(self):
+        with self.lock:
+            self.failures = 0
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(domain):
+    with _limiters_lock:
+        limiter = _limiters.get(domain)
+        if limiter is None:
+            limiter = DomainLimiter(domain, **_limits_for(domain))
+            _limiters[domain] = limiter
+        return limiter
+
+
+@contextmanager
+def slot(url):
+    """
+    Espera a vez do domínio da URL (concorrência e token bucket) antes da
+    requisição. Levanta Blocked se o domínio estiver em backoff longo.
+    """
+    limiter = get_limiter(domain_of(url))
+    with limiter.slots:
+        wait = limiter.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        yield limiter
+
+
+def observe(limiter, response, check_body=True):
+    """
+    Analisa a resposta: 429/503 e páginas de bloqueio colocam o domínio em
+    backoff (respeitando Retry-After) e levantam Blocked
+    """
+    if response.status_code in THROTTLE_STATUSES:
+        with limiter.lock:
+            limiter.stats['throttled'] += 1
+        seconds = limiter.back_off(retry_after_seconds(response))
+        raise Blocked(
+            f"{limiter.domain} respondeu {response.status_code}; backoff de {seconds:.0f}s",
+            response=response, retry_after=seconds
+        )
+    if check_body and is_block_page(response):
+        with limiter.lock:
+            limiter.stats['block_pages'] += 1
+        seconds = limiter.back_off()
+        raise Blocked(
+            f"{limiter.domain} retornou página de bloqueio; backoff de {seconds:.0f}s",
+            response=response, retry_after=seconds
+        )
+    limiter.succeeded()
+
+
+def get_stats():
+    """
+    Contadores por domínio
+    """
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    stats = {}
+    for limiter in limiters:
+        with limiter.lock:
+            stats[limiter.domain] = dict(limiter.stats, backoff_seconds=max(limiter.blocked_until - time.monotonic(), 0.0))
+    return stats
+
+
+def reset_stats():
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    for limiter in limiters:
+        with limiter.lock:
+            for key in limiter.stats:
+                limiter.stats[key] = 0 if key != 'wait_seconds' else 0.0
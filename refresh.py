@@ -0,0 +1,435 @@
+import os
+import time
+import threading
+import concurrent.futures
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from utils import get_db_connection, PriceWriter, TIMESTAMP_FORMAT
+import page_cache
+import ratelimit
+
+# Limites de concorrência do motor de atualização
+REFRESH_MAX_WORKERS = int(os.getenv('REFRESH_MAX_WORKERS', 16))
+REFRESH_MAX_PER_DOMAIN = int(os.getenv('REFRESH_MAX_PER_DOMAIN', 2))
+
+# Parâmetros de rastreamento que não mudam a página do produto
+TRACKING_PARAMS = {
+    'gclid', 'gbraid', 'wbraid', 'fbclid', 'msclkid', 'yclid', 'igshid',
+    'mc_cid', 'mc_eid', '_ga', 'ref', 'ref_', 'srsltid'
+}
+TRACKING_PREFIXES = ('utm_',)
+DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+# Agendamento adaptativo: cada link é verificado de novo em um intervalo
+# proporcional ao tempo médio entre mudanças de preço observado na janela.
+# Links que mudam ficam entre o mínimo (abaixo da cadência fixa anterior,
+# para os mais voláteis) e a cadência fixa; só links sem mudança na janela
+# passam dela, com intervalo crescendo com o tempo sem mudança, até o
+# máximo. Links sem histórico suficiente e links que falharam usam a
+# cadência fixa.
+ADAPTIVE_REFRESH = os.getenv('ADAPTIVE_REFRESH', '1') == '1'
+CHECK_MIN_INTERVAL_HOURS = float(os.getenv('CHECK_MIN_INTERVAL_HOURS', 0.25))
+CHECK_BASELINE_INTERVAL_HOURS = float(os.getenv('CHECK_BASELINE_INTERVAL_HOURS', 1))
+CHECK_MAX_INTERVAL_HOURS = float(os.getenv('CHECK_MAX_INTERVAL_HOURS', 24))
+CHECK_WINDOW_DAYS = int(os.getenv('CHECK_WINDOW_DAYS', 90))
+CHECK_MIN_HISTORY_HOURS = 48
+# Imagem, favicon e logo são buscados de novo (scraping completo) quando a
+# última busca de metadados tem mais que isso
+METADATA_TTL_HOURS = float(os.getenv('METADATA_TTL_HOURS', 24 * 7))
+# Verificações por intervalo médio entre mudanças
+CHECKS_PER_CHANGE = float(os.getenv('CHECKS_PER_CHANGE', 8))
+# Link sem mudanças: intervalo = tempo observado / CHECK_STABLE_GROWTH
+# (1h após 4 dias, 7,5h após 30 dias, 22,5h após 90 dias)
+CHECK_STABLE_GROWTH = float(os.getenv('CHECK_STABLE_GROWTH', 96))
+
+
+# Pools de threads do RefreshEngine, mantidos entre ciclos: cada thread
+# guarda sua conexão SQLite (utils.get_db_connection) e um pool novo por
+# ciclo abriria e fecharia uma conexão por thread a cada atualização
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def _shared_executor(max_workers):
+    """
+    Retorna o pool de threads deste processo com max_workers threads,
+    criando-o na primeira vez (um processo filho de fork cria o seu)
+    """
+    key = (os.getpid(), max_workers)
+    with _executors_lock:
+        executor = _executors.get(key)
+        if executor is None:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='refresh')
+            _executors[key] = executor
+        return executor
+
+
+def _percentile(values, pct):
+    """
+    Retorna o percentil (0-100) de uma lista de valores
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = int(round((pct / 100) * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def plan_by_domain(links):
+    """
+    Separa os links em filas por domínio (o mesmo do ratelimit), dos
+    domínios com mais trabalho para os com menos, mantendo a ordem de
+    prioridade dos links dentro de cada domínio
+    """
+    queues = {}
+    for link in links:
+        queues.setdefault(ratelimit.domain_of(link['product_url']), deque()).append(link)
+    return dict(sorted(queues.items(), key=lambda item: -len(item[1])))
+
+
+class RefreshEngine:
+    """
+    Executa o scraping de vários links em paralelo, com limite global de
+    concorrência e limite por domínio. Os links são entregues aos workers em
+    rodízio entre os domínios e só quando o domínio tem vaga, então nenhum
+    worker fica parado esperando uma loja lenta enquanto outras têm trabalho.
+    """
+
+    def __init__(self, fetch, max_workers=REFRESH_MAX_WORKERS, max_per_domain=REFRESH_MAX_PER_DOMAIN):
+        self.fetch = fetch
+        self.max_workers = max_workers
+        self.max_per_domain = max_per_domain
+
+    def domain_limit(self, domain):
+        """
+        Links simultâneos do domínio: além da concorrência do ratelimit os
+        workers só ficariam bloqueados esperando a vez
+        """
+        return max(min(self.max_per_domain, ratelimit.get_limiter(domain).concurrency), 1)
+
+    def _run_one(self, link):
+        """
+        Faz o scraping de um único link
+        """
+        started = time.monotonic()
+        try:
+            info = self.fetch(link)
+            error = None
+        except Exception as e:
+            info = None
+            error = e
+        return link, info, error, time.monotonic() - started
+
+    def run(self, links, on_result):
+        """
+        Distribui os links entre os workers (fetch recebe o link inteiro) e chama on_result(link, info, error)
+        à medida que cada scraping termina. Retorna as estatísticas da execução.
+        """
+        started = time.monotonic()
+        latencies = []
+        ok = 0
+        failed = 0
+        queues = plan_by_domain(links)
+        limits = {domain: self.domain_limit(domain) for domain in queues}
+        in_flight = defaultdict(int)
+        rotation = deque(queues)
+        pending = {}
+
+        def dispatch(executor):
+            # Rodízio: o próximo link vem do próximo domínio com vaga
+            while len(pending) < self.max_workers:
+                for _ in range(len(rotation)):
+                    domain = rotation[0]
+                    rotation.rotate(-1)
+                    if in_flight[domain] < limits[domain]:
+                        break
+                else:
+                    return
+                link = queues[domain].popleft()
+                if not queues[domain]:
+                    rotation.remove(domain)
+                in_flight[domain] += 1
+                pending[executor.submit(self._run_one, link)] = domain
+
+        executor = _shared_executor(self.max_workers)
+        dispatch(executor)
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                in_flight[pending.pop(future)] -= 1
+            # Repõe os workers antes de processar os resultados
+            dispatch(executor)
+            for future in done:
+                link, info, error, elapsed = future.result()
+                latencies.append(elapsed)
+                try:
+                    if on_result(link, info, error):
+                        ok += 1
+                    else:
+                        failed += 1
+                except Exception as e:
+                    failed += 1
+                    print(f"✗ Erro ao processar resultado de {link['product_url']}: {e}")
+
+        duration = time.monotonic() - started
+        return {
+            'total': len(links),
+            'ok': ok,
+            'failed': failed,
+            'domains': len(queues),
+            'duration': duration,
+            'links_per_sec': len(links) / duration if duration > 0 else 0.0,
+            'p50_latency': _percentile(latencies, 50),
+            'p95_latency': _percentile(latencies, 95)
+        }
+
+
+def print_stats(stats):
+    """
+    Exibe o resumo de throughput de uma execução
+    """
+    unit = 'URLs' if 'links' in stats else 'links'
+    print(
+        f"Atualização concluída: {stats['ok']}/{stats['total']} {unit} de {stats.get('domains', 0)} domínios "
+        f"em {stats['duration']:.1f}s "
+        f"({stats['links_per_sec']:.2f} {unit}/s, p50 {stats['p50_latency']:.2f}s, "
+        f"p95 {stats['p95_latency']:.2f}s)"
+    )
+    if 'links' in stats:
+        print(
+            f"Deduplicação: {stats['links']} links em {stats['total']} URLs distintas "
+            f"({stats['dedup_ratio']:.0%} de buscas evitadas), {stats['links_ok']} links atualizados"
+        )
+    if stats.get('links_total'):
+        print(
+            f"Agendamento: {stats['links_skipped']} de {stats['links_total']} links ainda não vencidos, "
+            f"próxima verificação em média em {stats['mean_interval_hours']:.1f}h"
+        )
+    if 'price_writes' in stats:
+        print(f"Preços gravados: {stats['price_writes']} em {stats['price_flushes']} transações")
+    cache_stats = stats.get('page_cache')
+    if cache_stats:
+        print(
+            f"Cache de páginas: {cache_stats['hit_rate']:.0%} de acerto "
+            f"({cache_stats['not_modified']} respostas 304, {cache_stats['unchanged_body']} corpos idênticos), "
+            f"{cache_stats['bytes_saved'] / 1024:.0f} KB economizados"
+        )
+    rate_limit = stats.get('rate_limit')
+    if rate_limit:
+        limited = {
+            domain: counters for domain, counters in rate_limit.items()
+            if counters['throttled'] or counters['block_pages'] or counters['rejected'] or counters['waits']
+        }
+        for domain, counters in sorted(limited.items(), key=lambda x: -x[1]['wait_seconds']):
+            print(
+                f"Limite de taxa {domain}: {counters['requests']} requisições, {counters['waits']} esperas "
+                f"({counters['wait_seconds']:.1f}s), {counters['throttled']} 429/503, "
+                f"{counters['block_pages']} páginas de bloqueio, {counters['rejected']} recusadas em backoff"
+            )
+    price_tiers = stats.get('price_tiers')
+    if price_tiers:
+        summary = ', '.join(f"{tier}: {count}" for tier, count in sorted(price_tiers.items(), key=lambda x: -x[1]))
+        print(f"Origem dos preços: {summary}")
+
+
+def normalize_url(url):
+    """
+    Normaliza a URL do produto para que variações do mesmo endereço sejam
+    buscadas uma só vez: host em minúsculas sem porta padrão, sem fragmento,
+    sem parâmetros de rastreamento e com os demais parâmetros ordenados
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').rstrip('.')
+    if parts.port and str(parts.port) != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    )
+    return urlunsplit((scheme, host, parts.path or '/', urlencode(query), ''))
+
+
+def group_links(links):
+    """
+    Agrupa os links pela URL normalizada. Cada grupo tem a URL a ser buscada
+    e a lista de links (de produtos/usuários diferentes) que recebem o preço.
+    """
+    groups = {}
+    for link in links:
+        url = normalize_url(link['product_url'])
+        groups.setdefault(url, {'product_url': url, 'links': []})['links'].append(link)
+    return list(groups.values())
+
+
+def needs_metadata(link, now=None):
+    """
+    Indica se os metadados do link (imagem, favicon, logo) nunca foram
+    buscados ou venceram (METADATA_TTL_HOURS) e ele precisa de scraping
+    completo. Um link cuja página não tem imagem válida só é tentado de
+    novo quando vencer.
+    """
+    updated = link.get('metadata_updated_at')
+    if not updated:
+        return True
+    now = now or datetime.utcnow()
+    return now - datetime.fromisoformat(str(updated)[:19]) >= timedelta(hours=METADATA_TTL_HOURS)
+
+
+def check_interval(changes, observed_hours):
+    """
+    Intervalo (em horas) até a próxima verificação de um link que mudou de
+    preço changes vezes em observed_hours de histórico
+    """
+    if observed_hours < CHECK_MIN_HISTORY_HOURS:
+        return CHECK_BASELINE_INTERVAL_HOURS
+    if not changes:
+        # Sem mudanças: o intervalo cresce com o tempo de estabilidade
+        interval = observed_hours / CHECK_STABLE_GROWTH
+        return min(max(interval, CHECK_BASELINE_INTERVAL_HOURS), CHECK_MAX_INTERVAL_HOURS)
+    interval = observed_hours / changes / CHECKS_PER_CHANGE
+    return min(max(interval, CHECK_MIN_INTERVAL_HOURS), CHECK_BASELINE_INTERVAL_HOURS)
+
+
+def schedule_next_checks(link_ids, failed_ids=(), now=None):
+    """
+    Calcula e grava next_check_at dos links a partir das mudanças de preço
+    na janela de CHECK_WINDOW_DAYS. Links que falharam tentam de novo na
+    intervalo mínimo. Retorna {link_id: intervalo em horas}.
+    """
+    now = now or datetime.utcnow()
+    window_start = (now - timedelta(days=CHECK_WINDOW_DAYS)).strftime(TIMESTAMP_FORMAT)
+    intervals = {link_id: CHECK_BASELINE_INTERVAL_HOURS for link_id in failed_ids}
+    link_ids = list(link_ids)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        for start in range(0, len(link_ids), 500):
+            chunk = link_ids[start:start + 500]
+            history = {}
+            cursor.execute(f'''
+                SELECT link_id,
+                       SUM(prev_price IS NOT NULL AND price != prev_price) AS changes,
+                       MIN(timestamp) AS first_seen
+                FROM (
+                    SELECT link_id, price, timestamp,
+                           LAG(price) OVER (PARTITION BY link_id ORDER BY timestamp, id) AS prev_price
+                    FROM price_history
+                    WHERE link_id IN ({', '.join('?' * len(chunk))})
+                      AND COALESCE(last_seen, timestamp) >= ?
+                )
+                GROUP BY link_id
+            ''', (*chunk, window_start))
+            for link_id, changes, first_seen in cursor.fetchall():
+                history[link_id] = (changes, first_seen)
+            for link_id in chunk:
+                changes, first_seen = history.get(link_id, (0, None))
+                observed = (now - datetime.fromisoformat(str(first_seen)[:19])).total_seconds() / 3600 if first_seen else 0
+                intervals[link_id] = check_interval(changes, observed)
+
+        cursor.executemany(
+            'UPDATE product_links SET next_check_at = ? WHERE id = ?',
+            [
+                ((now + timedelta(hours=hours)).strftime(TIMESTAMP_FORMAT), link_id)
+                for link_id, hours in intervals.items()
+            ]
+        )
+        conn.commit()
+    return intervals
+
+
+def refresh_all_prices(fetch=None):
+    """
+    Atualiza os preços de todos os links cadastrados. Único caminho de
+    atualização usado pelo job agendado, pela thread em segundo plano e pelo
+    scraper.update_prices. Cada URL distinta é buscada uma vez e o preço é
+    replicado para todos os links que apontam para ela. Grupos em que todos
+    os links têm metadados dentro do METADATA_TTL_HOURS são atualizados no
+    modo só-preço. Com ADAPTIVE_REFRESH, só os links com next_check_at
+    vencido são buscados.
+    """
+    from scraper import fetch_product_info, reset_price_tier_stats, get_price_tier_stats, FETCH_FULL, FETCH_PRICE
+    if fetch is None:
+        fetch = fetch_product_info
+
+    def fetch_group(group):
+        mode = FETCH_FULL if any(needs_metadata(link) for link in group['links']) else FETCH_PRICE
+        return mode, fetch(group['product_url'], mode=mode)
+
+    print(f"\nIniciando atualização de preços: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+    page_cache.reset_stats()
+    ratelimit.reset_stats()
+    reset_price_tier_stats()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        if ADAPTIVE_REFRESH:
+            # Fila de prioridade: links nunca agendados e depois os vencidos,
+            # em duas partes para que ambas usem o índice de next_check_at
+            cursor.execute('''
+                SELECT * FROM product_links WHERE next_check_at IS NULL
+                UNION ALL
+                SELECT * FROM product_links WHERE next_check_at <= ?
+                ORDER BY next_check_at
+            ''', (datetime.utcnow().strftime(TIMESTAMP_FORMAT),))
+        else:
+            cursor.execute('SELECT * FROM product_links')
+        links = [dict(row) for row in cursor.fetchall()]
+        cursor.execute('SELECT COUNT(*) FROM product_links')
+        total_links = cursor.fetchone()[0]
+    groups = group_links(links)
+    print(f"Encontrados {len(links)} de {total_links} links para atualizar ({len(groups)} URLs distintas)")
+    links_ok = 0
+    ok_ids = []
+    failed_ids = []
+
+    with PriceWriter() as writer:
+        def on_result(group, result, error):
+            nonlocal links_ok
+            product_url = group['product_url']
+            if error:
+                print(f"✗ Erro ao atualizar {product_url}: {error}")
+                failed_ids.extend(link['id'] for link in group['links'])
+                return False
+            mode, product_info = result
+            if not product_info['price']:
+                print(f"✗ Não foi possível encontrar o preço: {product_url}")
+                failed_ids.extend(link['id'] for link in group['links'])
+                return False
+
+            # Registra o novo preço em todos os links da URL (gravado em lote pelo PriceWriter)
+            now = datetime.utcnow()
+            for link in group['links']:
+                writer.add_price(link['id'], product_info['price'])
+
+                # Atualiza informações do link (imagem/logo só quando foram
+                # buscados; um valor não encontrado mantém o anterior)
+                if mode == FETCH_FULL:
+                    metadata = {
+                        field: product_info[field] for field in ('image_url', 'favicon_url', 'logo_url')
+                        if product_info[field]
+                    }
+                    writer.update_link(link['id'], last_update=now, metadata_updated_at=now, **metadata)
+                else:
+                    writer.update_link(link['id'], last_update=now)
+            links_ok += len(group['links'])
+            ok_ids.extend(link['id'] for link in group['links'])
+            print(f"✓ Preço atualizado para {product_url} ({len(group['links'])} links): R$ {product_info['price']:.2f}")
+            return True
+
+        stats = RefreshEngine(fetch_group).run(groups, on_result)
+
+    # Com os preços gravados, agenda a próxima verificação de cada link
+    intervals = schedule_next_checks(ok_ids, failed_ids) if ADAPTIVE_REFRESH else {}
+    stats['links_total'] = total_links
+    stats['links_skipped'] = total_links - len(links)
+    stats['mean_interval_hours'] = sum(intervals.values()) / len(intervals) if intervals else 0.0
+    stats['links'] = len(links)
+    stats['links_ok'] = links_ok
+    stats['dedup_ratio'] = 1 - len(groups) / len(links) if links else 0.0
+    stats['price_writes'] = writer.flushed_prices
+    stats['price_flushes'] = writer.flushes
+    stats['page_cache'] = page_cache.get_stats()
+    stats['price_tiers'] = get_price_tier_stats()
+    stats['rate_limit'] = ratelimit.get_stats()
+    print_stats(stats)
+    return stats
@@ -1,23 +1,35 @@
 import os
-import threading
+import sys
+import subprocess
 from app import app
-from update_prices import job as update_job
-import schedule
-import time
 
-def run_price_updates():
-    """Thread para atualização de preços"""
-    while True:
+# O agendador de preços e a fila de jobs (worker.py) rodam em um processo
+# próprio, iniciado pelo mestre do gunicorn quando ele fica pronto. Nada de
+# threads no mestre: os workers são criados por fork e herdariam locks
+# presos por elas. Com WORKER_PROCESS=0 o worker.py deve rodar à parte.
+WORKER_PROCESS = os.getenv('WORKER_PROCESS', '1') == '1'
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'worker.py')
+
+_worker = None
+
+
+def start_worker(server):
+    """Hook when_ready: inicia o worker.py"""
+    global _worker
+    if WORKER_PROCESS:
+        _worker = subprocess.Popen([sys.executable, WORKER_SCRIPT])
+        print(f"Processo do agendador iniciado (pid {_worker.pid})")
+
+
+def stop_worker(server):
+    """Hook on_exit: encerra o worker.py junto com o servidor"""
+    if _worker and _worker.poll() is None:
+        _worker.terminate()
         try:
-            update_job()  # Executa imediatamente na primeira vez
-            schedule.every(1).hour.do(update_job)
-            
-            while True:
-                schedule.run_pending()
-                time.sleep(60)  # Verifica a cada minuto
-        except Exception as e:
-            print(f"Erro no processo de atualização: {e}")
-            time.sleep(300)  # Espera 5 minutos antes de tentar novamente
+            _worker.wait(10)
+        except subprocess.TimeoutExpired:
+            _worker.kill()
+
 
 def run_flask():
     """Thread para o servidor Flask"""
@@ -25,11 +37,6 @@ def run_flask():
     app.run(host='0.0.0.0', port=port)
 
 if __name__ == "__main__":
-    # Inicia thread de atualização de preços
-    update_thread = threading.Thread(target=run_price_updates)
-    update_thread.daemon = True
-    update_thread.start()
-    
     # Inicia o servidor Flask com Gunicorn
     from gunicorn.app.base import BaseApplication
 
@@ -50,7 +57,9 @@ if __name__ == "__main__":
         'bind': '0.0.0.0:' + str(os.environ.get("PORT", 5000)),
         'workers': 3,
         'timeout': 120,
-        'worker_class': 'sync'
+        'worker_class': 'sync',
+        'when_ready': start_worker,
+        'on_exit': stop_worker
     }
 
     FlaskApplication(app, options).run() 
\ No newline at end of file
@@ -0,0 +1,163 @@
+import os
+import time
+import uuid
+import socket
+import threading
+from utils import get_db_connection, init_db
+
+# Intervalo entre ciclos de atualização e duração do lease no banco. Cada
+# ciclo só busca os links vencidos (ver refresh.schedule_next_checks), então
+# ciclos curtos não aumentam o volume de requisições. O lease é renovado
+# enquanto a atualização roda; se o processo morrer, outro assume depois
+# que ele expira.
+REFRESH_INTERVAL_SECONDS = int(os.getenv('REFRESH_INTERVAL_SECONDS', 900))
+SCHEDULER_POLL_SECONDS = int(os.getenv('SCHEDULER_POLL_SECONDS', 60))
+LEASE_TTL_SECONDS = int(os.getenv('LEASE_TTL_SECONDS', 300))
+
+REFRESH_LEASE = 'price_refresh'
+
+_OWNER_TOKEN = uuid.uuid4().hex[:8]
+
+
+def owner_id():
+    """
+    Identifica este processo como dono de leases (inclui o pid atual, já
+    que processos filhos de um fork herdam o módulo importado)
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{_OWNER_TOKEN}"
+
+
+# O lease é por processo; entre threads do mesmo processo vale este lock
+_running = {}
+_running_lock = threading.Lock()
+
+
+def acquire_lease(name, owner=None, ttl=LEASE_TTL_SECONDS):
+    """
+    Tenta obter (ou renovar) o lease. Só funciona se ninguém o tiver ou se
+    o lease atual estiver expirado. Retorna True se este dono ficou com ele.
+    """
+    owner = owner or owner_id()
+    now = time.time()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO scheduler_leases (name, owner, expires_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                owner = excluded.owner,
+                expires_at = excluded.expires_at
+            WHERE scheduler_leases.owner = excluded.owner
+               OR scheduler_leases.owner IS NULL
+               OR scheduler_leases.expires_at < ?
+        ''', (name, owner, now + ttl, now))
+        conn.commit()
+        return cursor.rowcount > 0
+
+
+def release_lease(name, owner=None):
+    owner = owner or owner_id()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE scheduler_leases
+            SET owner = NULL, expires_at = 0
+            WHERE name = ? AND owner = ?
+        ''', (name, owner))
+        conn.commit()
+
+
+def get_lease(name):
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM scheduler_leases WHERE name = ?', (name,))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+
+
+def _mark_run(name, column):
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'UPDATE scheduler_leases SET {column} = ? WHERE name = ?', (time.time(), name))
+        conn.commit()
+
+
+def run_exclusive(name, func, *args, **kwargs):
+    """
+    Executa func só se conseguir o lease, renovando-o em uma thread enquanto
+    func roda. Retorna (executou, resultado).
+    """
+    with _running_lock:
+        local_lock = _running.setdefault(name, threading.Lock())
+    if not local_lock.acquire(blocking=False):
+        print(f"'{name}' já está em execução neste processo; ignorando")
+        return False, None
+    try:
+        return _run_with_lease(name, func, *args, **kwargs)
+    finally:
+        local_lock.release()
+
+
+def _run_with_lease(name, func, *args, **kwargs):
+    if not acquire_lease(name):
+        lease = get_lease(name)
+        print(f"'{name}' já está em execução por {lease['owner'] if lease else '?'}; ignorando")
+        return False, None
+
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(LEASE_TTL_SECONDS / 3):
+            try:
+                if not acquire_lease(name):
+                    print(f"Lease '{name}' perdido durante a execução")
+            except Exception as e:
+                print(f"Erro ao renovar lease '{name}': {e}")
+
+    renewer = threading.Thread(target=heartbeat, name=f'lease-{name}', daemon=True)
+    renewer.start()
+    _mark_run(name, 'last_started_at')
+    try:
+        result = func(*args, **kwargs)
+        _mark_run(name, 'last_finished_at')
+        return True, result
+    finally:
+        stop.set()
+        renewer.join()
+        release_lease(name)
+
+
+def refresh_due(interval=REFRESH_INTERVAL_SECONDS):
+    """
+    Indica se a última atualização concluída (em qualquer processo) foi há
+    mais de interval segundos
+    """
+    lease = get_lease(REFRESH_LEASE)
+    return not lease or not lease['last_finished_at'] or time.time() - lease['last_finished_at'] >= interval
+
+
+def refresh_once(fetch=None):
+    """
+    Roda uma atualização de preços se nenhum outro processo estiver rodando
+    """
+    from refresh import refresh_all_prices
+    return run_exclusive(REFRESH_LEASE, refresh_all_prices, fetch)
+
+
+def run_scheduler(interval=REFRESH_INTERVAL_SECONDS, poll=SCHEDULER_POLL_SECONDS):
+    """
+    Loop do agendador: a cada poll segundos verifica se a atualização está
+    vencida e, se estiver, tenta executá-la sob o lease. Vários agendadores
+    podem rodar ao mesmo tempo; só um atualiza por vez e o intervalo é
+    contado a partir da última execução registrada no banco.
+    """
+    init_db()
+    print(f"Agendador iniciado ({owner_id()}), atualização a cada {interval}s")
+    while True:
+        try:
+            if refresh_due(interval):
+                refresh_once()
+        except Exception as e:
+            print(f"Erro no agendador: {e}")
+        time.sleep(poll)
+
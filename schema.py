@@ -1,10 +1,11 @@
 import sqlite3
+from utils import DB_PATH
 
 def init_db():
     """
     Inicializa o banco de dados SQLite com as tabelas necessárias
     """
-    conn = sqlite3.connect('appscraper.db')
+    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
 
     # Criação das tabelas
@@ -49,11 +50,55 @@ def init_db():
             FOREIGN KEY (link_id) REFERENCES product_links(id)
         );
 
+        CREATE TABLE IF NOT EXISTS page_cache (
+            product_url TEXT PRIMARY KEY,
+            etag TEXT,
+            last_modified TEXT,
+            content_hash TEXT,
+            content_length INTEGER,
+            price REAL,
+            image_url TEXT,
+            site_name TEXT,
+            favicon_url TEXT,
+            logo_url TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS image_cache (
+            image_url TEXT PRIMARY KEY,
+            width INTEGER NOT NULL,
+            height INTEGER NOT NULL,
+            bytes INTEGER,
+            content_type TEXT,
+            probed_at TIMESTAMP NOT NULL,
+            last_used_at TIMESTAMP NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS site_logos (
+            domain TEXT PRIMARY KEY,
+            favicon_url TEXT,
+            logo_url TEXT,
+            updated_at TIMESTAMP NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS extraction_rules (
+            domain TEXT PRIMARY KEY,
+            price_selector TEXT,
+            image_selector TEXT,
+            locale TEXT,
+            updated_at TIMESTAMP NOT NULL
+        );
+
         CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
         CREATE INDEX IF NOT EXISTS idx_product_links_url ON product_links(product_url);
+        CREATE INDEX IF NOT EXISTS idx_image_cache_last_used ON image_cache(last_used_at);
     ''')
 
     conn.commit()
+
+    # Aplica as migrações versionadas (índices, colunas novas)
+    from migrations import apply_migrations
+    apply_migrations(conn)
     conn.close()
 
 if __name__ == '__main__':
@@ -1,24 +1,228 @@
-import requests
-from bs4 import BeautifulSoup
+import os
+import http_client
+import page_cache
+import image_cache
+import logo_cache
+import structured_data
+import extraction_rules
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+import soupsieve
 from urllib.parse import urlparse
 import re
-from utils import get_db_connection, log_price
 from PIL import Image
 from io import BytesIO
+import struct
 import concurrent.futures
+import threading
+import functools
+from collections import Counter
 
-def get_image_resolution(img_url):
+# Quantidade máxima de bytes lida ao sondar apenas o cabeçalho da imagem
+IMAGE_PROBE_BYTES = 64 * 1024
+IMAGE_PROBE_CHUNK = 4 * 1024
+
+# Parser HTML: lxml (em C) quando instalado, senão o html.parser do Python
+try:
+    import lxml  # noqa: F401
+    DEFAULT_HTML_PARSER = 'lxml'
+except ImportError:
+    DEFAULT_HTML_PARSER = 'html.parser'
+HTML_PARSER = os.getenv('HTML_PARSER', DEFAULT_HTML_PARSER)
+
+def _is_price_region(name, attrs):
+    """
+    Filtro do SoupStrainer para o modo só-preço: mantém metadados e os
+    elementos com 'price' na classe (com todo o seu conteúdo)
+    """
+    if name in ('meta', 'script'):
+        return True
+    classes = attrs.get('class') or ''
+    if isinstance(classes, (list, tuple)):
+        classes = ' '.join(classes)
+    return 'price' in classes.lower()
+
+PRICE_STRAINER = SoupStrainer(_is_price_region)
+
+# Combinadores CSS (descendente, >, +, ~) fora de colchetes e aspas
+_COMBINATOR_RE = re.compile(r'\S\s*[\s>+~]\s*\S')
+_QUOTED_RE = re.compile(r'\[[^\]]*\]|"[^"]*"|\'[^\']*\'|\([^)]*\)')
+
+@functools.lru_cache(maxsize=256)
+def _rule_strainer(selector):
     """
-    Obtém a resolução real da imagem
+    Strainer que também mantém os elementos do seletor da regra. O strainer
+    não guarda os ancestrais, então seletores com combinadores só casam na
+    árvore inteira: nesse caso retorna None.
     """
+    parts = [part.strip() for part in _QUOTED_RE.sub('x', selector).split(',')]
+    if any(_COMBINATOR_RE.search(part) for part in parts):
+        return None
     try:
-        response = requests.get(img_url, timeout=5)
-        img = Image.open(BytesIO(response.content))
-        width, height = img.size
-        return width * height
+        compiled = soupsieve.compile(selector)
+    except soupsieve.SelectorSyntaxError:
+        return PRICE_STRAINER
+    return SoupStrainer(lambda name, attrs: _is_price_region(name, attrs) or compiled.match(Tag(name=name, attrs=attrs)))
+
+def price_strainer(domain):
+    """
+    Strainer do modo só-preço para o domínio: o padrão mais o alvo do
+    seletor configurado ou aprendido em extraction_rules, ou None (árvore
+    inteira) quando o strainer não consegue preservar o alvo
+    """
+    selector = extraction_rules.get_rule(domain).get('price_selector')
+    return _rule_strainer(selector) if selector else PRICE_STRAINER
+
+def make_soup(content, parser=None, parse_only=None):
+    """
+    Cria a árvore BeautifulSoup com o parser configurado, opcionalmente
+    restrita às regiões aceitas por parse_only
+    """
+    return BeautifulSoup(content, parser or HTML_PARSER, parse_only=parse_only)
+
+# Contadores de qual etapa resolveu o preço de cada página
+_price_tier_stats = Counter()
+_price_tier_lock = threading.Lock()
+
+def record_price_tier(tier):
+    with _price_tier_lock:
+        _price_tier_stats[tier] += 1
+
+def get_price_tier_stats():
+    with _price_tier_lock:
+        return dict(_price_tier_stats)
+
+def reset_price_tier_stats():
+    with _price_tier_lock:
+        _price_tier_stats.clear()
+
+# Modos de scraping aceitos por fetch_product_info
+FETCH_FULL = 'full'
+FETCH_PRICE = 'price'
+
+# Campos extraídos em cada modo (e exigidos do cache de páginas)
+MODE_FIELDS = {
+    FETCH_FULL: ('price', 'image_url', 'site_name', 'favicon_url', 'logo_url'),
+    FETCH_PRICE: ('price', 'site_name')
+}
+
+# Campos que precisam estar preenchidos no cache para reaproveitá-lo
+REQUIRED_CACHE_FIELDS = {
+    FETCH_FULL: ('price', 'favicon_url'),
+    FETCH_PRICE: ('price',)
+}
+
+# Marcadores SOF do JPEG que carregam as dimensões
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def parse_image_header(data):
+    """
+    Extrai (largura, altura) do cabeçalho de um JPEG, PNG, WebP ou GIF.
+    Retorna None se os bytes recebidos ainda não forem suficientes.
+    """
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        if len(data) >= 24:
+            return struct.unpack('>II', data[16:24])
+        return None
+
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        if len(data) >= 10:
+            return struct.unpack('<HH', data[6:10])
+        return None
+
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        chunk = data[12:16]
+        if chunk == b'VP8 ' and len(data) >= 30:
+            width, height = struct.unpack('<HH', data[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b'VP8L' and len(data) >= 25:
+            bits = int.from_bytes(data[21:25], 'little')
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b'VP8X' and len(data) >= 30:
+            width = int.from_bytes(data[24:27], 'little') + 1
+            height = int.from_bytes(data[27:30], 'little') + 1
+            return width, height
+        return None
+
+    if data[:2] == b'\xff\xd8':
+        offset = 2
+        while offset + 4 <= len(data):
+            if data[offset] != 0xFF:
+                offset += 1
+                continue
+            marker = data[offset + 1]
+            if marker == 0xFF:
+                offset += 1
+                continue
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                offset += 2
+                continue
+            length = struct.unpack('>H', data[offset + 2:offset + 4])[0]
+            if marker in JPEG_SOF_MARKERS:
+                if offset + 9 > len(data):
+                    return None
+                height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+                return width, height
+            offset += 2 + length
+        return None
+
+    return None
+
+def _download_image_size(img_url):
+    """
+    Baixa a imagem inteira e decodifica o tamanho com o PIL
+    """
+    response = http_client.get(img_url, timeout=5)
+    img = Image.open(BytesIO(response.content))
+    width, height = img.size
+    return {
+        'width': width,
+        'height': height,
+        'bytes': len(response.content),
+        'content_type': response.headers.get('Content-Type')
+    }
+
+def probe_image(img_url):
+    """
+    Lê só os primeiros KB da imagem (Range + leitura em stream) e extrai as
+    dimensões do cabeçalho. Se o cabeçalho não for conclusivo, recorre ao
+    download completo.
+    """
+    data = b''
+    size = None
+    headers = {'Range': f'bytes=0-{IMAGE_PROBE_BYTES - 1}'}
+    with http_client.get(img_url, headers=headers, stream=True, timeout=5) as response:
+        content_type = response.headers.get('Content-Type')
+        if response.status_code in (200, 206):
+            for chunk in response.iter_content(IMAGE_PROBE_CHUNK):
+                data += chunk
+                size = parse_image_header(data)
+                if size or len(data) >= IMAGE_PROBE_BYTES:
+                    break
+
+    if size and size[0] and size[1]:
+        return {
+            'width': size[0],
+            'height': size[1],
+            'bytes': len(data),
+            'content_type': content_type
+        }
+
+    info = _download_image_size(img_url)
+    info['bytes'] += len(data)
+    return info
+
+def get_image_resolution(img_url, probe=True):
+    """
+    Obtém as dimensões reais da imagem, ou None se não foi possível medir.
+    Não grava no cache: roda nas threads temporárias de find_product_image,
+    e quem grava é a thread que as chamou (sem abrir uma conexão SQLite por
+    thread de sondagem).
+    """
+    try:
+        return probe_image(img_url) if probe else _download_image_size(img_url)
     except Exception as e:
         print(f"Erro ao verificar resolução da imagem {img_url}: {e}")
-        return 0
+        return None
 
 def is_valid_image_url(url):
     """
@@ -94,8 +298,13 @@ def get_image_quality_score(url, resolution=None):
 
 def get_site_logos(soup, domain):
     """
-    Busca o favicon e o logotipo do site
+    Busca o favicon e o logotipo do site. O resultado é compartilhado por
+    todos os links do mesmo domínio via logo_cache.
     """
+    cached_logos = logo_cache.get(domain)
+    if cached_logos:
+        return cached_logos
+
     favicon_url = None
     logo_url = None
     
@@ -149,34 +358,34 @@ def get_site_logos(soup, domain):
             favicon_url = f"https://{domain}/{favicon_url.lstrip('/')}"
     
     # Verifica se o favicon existe
+    fallback_url = f"https://www.google.com/s2/favicons?domain={domain}&sz=64"
     try:
-        response = requests.head(favicon_url, timeout=5)
-        if response.status_code != 200:
-            favicon_url = f"https://www.google.com/s2/favicons?domain={domain}&sz=64"
-    except:
-        favicon_url = f"https://www.google.com/s2/favicons?domain={domain}&sz=64"
+        response = http_client.head(favicon_url, timeout=5)
+    except Exception as e:
+        # Falha de rede (timeout, bloqueio): usa o fallback nesta página, mas
+        # não o guarda no cache, senão o favicon real ficaria uma semana sem
+        # ser testado de novo
+        print(f"Erro ao verificar favicon de {domain}: {e}")
+        return {'favicon_url': fallback_url, 'logo_url': logo_url}
+    if response.status_code != 200:
+        favicon_url = fallback_url
     
-    return {
+    site_logos = {
         'favicon_url': favicon_url,
         'logo_url': logo_url
     }
+    logo_cache.save(domain, site_logos)
+    return site_logos
 
-def fetch_product_info(product_url):
+def find_product_image(soup, preferred=None, domain=None):
     """
-    Faz o scraping das informações do produto
+    Busca a imagem principal do produto, priorizando a de maior qualidade.
+    preferred é uma imagem já conhecida (ex.: dos dados estruturados) que
+    entra como primeira candidata. Com domain, usa direto o seletor de
+    imagem registrado para a loja e aprende o seletor da imagem escolhida.
     """
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    response = requests.get(product_url, headers=headers)
-    soup = BeautifulSoup(response.content, 'html.parser')
-    
-    domain = urlparse(product_url).netloc
-    site_name = domain.replace('www.', '').split('.')[0].capitalize()
-    
-    # Busca favicon e logo
-    site_logos = get_site_logos(soup, domain)
-    
+    rule_selector = extraction_rules.get_rule(domain).get('image_selector') if domain else None
+
     # Lista expandida de seletores prioritários
     image_selectors = [
         '#view-container img',
@@ -197,19 +406,33 @@ def fetch_product_info(product_url):
         '.full-price'
     ]
     
-    image_candidates = []
+    image_candidates = [preferred] if is_valid_image_url(preferred) else []
     
+    image_sources = {}
+    rule_hit = False
+    if rule_selector:
+        image_selectors = [rule_selector] + [selector for selector in image_selectors if selector != rule_selector]
+
     # Coleta todas as imagens candidatas
     for selector in image_selectors:
-        images = soup.select(selector)
+        try:
+            images = soup.select(selector)
+        except Exception as e:
+            print(f"Erro ao processar seletor de imagem {selector}: {e}")
+            continue
         for img in images:
             for attr in ['data-zoom-image', 'data-src', 'data-original', 'data-lazy', 'data-high-res', 'src']:
                 img_url = img.get(attr)
                 if is_valid_image_url(img_url):
                     image_candidates.append(img_url)
+                    image_sources.setdefault(img_url, selector)
+        # O seletor da loja encontrou imagens: dispensa os demais
+        if selector == rule_selector and image_candidates:
+            rule_hit = True
+            break
 
     # Se não encontrou imagens suficientes, procura em todas as imagens
-    if len(image_candidates) < 3:
+    if len(image_candidates) < 3 and not rule_hit:
         all_images = soup.find_all('img')
         for img in all_images:
             for attr in ['data-zoom-image', 'data-src', 'data-original', 'data-lazy', 'data-high-res', 'src']:
@@ -220,137 +443,223 @@ def fetch_product_info(product_url):
     # Remove duplicatas mantendo a ordem
     image_candidates = list(dict.fromkeys(image_candidates))
 
-    # Verifica resolução das imagens em paralelo
+    # Usa as resoluções já medidas em execuções anteriores
+    image_candidates = image_candidates[:5]
+    cached_images = image_cache.get_many(image_candidates)
     scored_images = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_url = {executor.submit(get_image_resolution, url): url for url in image_candidates[:5]}
-        for future in concurrent.futures.as_completed(future_to_url):
-            url = future_to_url[future]
-            try:
-                resolution = future.result()
-                score = get_image_quality_score(url, resolution)
-                scored_images.append({
-                    'url': url,
-                    'score': score,
-                    'resolution': resolution
-                })
-            except Exception as e:
-                print(f"Erro ao processar imagem {url}: {e}")
+    for url, info in cached_images.items():
+        resolution = info['width'] * info['height']
+        scored_images.append({
+            'url': url,
+            'score': get_image_quality_score(url, resolution),
+            'resolution': resolution
+        })
+
+    # Verifica em paralelo a resolução das imagens que ainda não estão no cache
+    pending_images = [url for url in image_candidates if url not in cached_images]
+    if pending_images:
+        measured = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
+            future_to_url = {executor.submit(get_image_resolution, url): url for url in pending_images}
+            for future in concurrent.futures.as_completed(future_to_url):
+                url = future_to_url[future]
+                try:
+                    info = future.result()
+                    resolution = info['width'] * info['height'] if info else 0
+                    if info:
+                        measured[url] = info
+                    score = get_image_quality_score(url, resolution)
+                    scored_images.append({
+                        'url': url,
+                        'score': score,
+                        'resolution': resolution
+                    })
+                except Exception as e:
+                    print(f"Erro ao processar imagem {url}: {e}")
+        image_cache.save_many(measured)
 
     # Ordena por pontuação
     scored_images.sort(key=lambda x: (x['score'], x['resolution']), reverse=True)
     
     # Seleciona a melhor imagem
     image_url = scored_images[0]['url'] if scored_images else None
+    if domain and image_sources.get(image_url):
+        extraction_rules.record_success(domain, image_selector=image_sources[image_url])
     if image_url and not image_url.startswith(('http://', 'https://')):
         image_url = f"https:{image_url}"
 
+    return image_url
+
+def parse_price_text(price_text, locale=extraction_rules.DEFAULT_LOCALE):
+    """
+    Converte o texto de preço para float conforme a localidade da loja
+    """
+    price_text = re.sub(r'[^\d,.]', '', price_text)
+    if locale.startswith('en'):
+        price_text = price_text.replace(',', '')
+    elif ',' in price_text and '.' in price_text:
+        price_text = price_text.replace('.', '').replace(',', '.')
+    else:
+        price_text = price_text.replace(',', '.')
+    return float(price_text)
+
+def _class_selector(soup, elem):
+    """
+    Monta um seletor CSS tag.classe para o elemento, usando uma classe com
+    'price'. Só serve se select_one o levar de volta ao próprio elemento
+    (e não a outro com a mesma classe que aparece antes, como um invólucro
+    vazio); senão retorna None e nada é aprendido.
+    """
+    for css_class in elem.get('class') or []:
+        if 'price' in css_class.lower() and re.match(r'^[A-Za-z_][\w-]*$', css_class):
+            selector = f"{elem.name}.{css_class}"
+            if soup.select_one(selector) is elem:
+                return selector
+    return None
+
+def extract_price(soup, domain):
+    """
+    Extrai o preço do produto da página. Tenta primeiro o seletor registrado
+    para o domínio em extraction_rules e, se cair na busca genérica, aprende
+    o seletor vencedor para as próximas páginas da mesma loja.
+    """
+    rule = extraction_rules.get_rule(domain)
+    locale = rule['locale']
+
     # Busca o preço
     price = None
-    
-    # Verifica se é um site da Apple
-    if 'apple.com' in domain:
+    tier = 'miss'
+
+    # Seletor conhecido ou aprendido para a loja
+    if rule.get('price_selector'):
+        price, _ = try_get_price_with_selector(soup, [rule['price_selector']], locale)
+        if price:
+            record_price_tier('rule')
+            extraction_rules.record_hit(domain, 'price_selector')
+            return price
+        # Uma página sem preço (ex.: produto esgotado) não descarta o seletor;
+        # só várias falhas seguidas
+        extraction_rules.record_miss(domain, 'price_selector')
+
+    learned_selector = None
+    price_elem = soup.find('h2', class_='price')
+    if price_elem:
+        # Remove o span interno se existir
+        span = price_elem.find('span')
+        if span:
+            span.decompose()
+        
+        # Pega o texto limpo
+        price_text = price_elem.get_text().strip()
         try:
-            # Busca exatamente o elemento da Apple com classe e data-autom específicos
-            price_elem = soup.find('span', {
-                'class': 'rc-prices-fullprice',
-                'data-autom': 'full-price'
-            })
-            
-            if price_elem:
-                price_text = price_elem.get_text().strip()
-                print(f"Texto do preço encontrado na Apple: {price_text}")
-                
-                # Remove R$ e outros caracteres
-                price_text = re.sub(r'[^\d,.]', '', price_text)
-                
-                # Trata casos com vírgula e ponto
-                if ',' in price_text and '.' in price_text:
-                    price_text = price_text.replace('.', '').replace(',', '.')
-                else:
-                    price_text = price_text.replace(',', '.')
-                
-                price = float(price_text)
-                print(f"✓ Preço encontrado no site da Apple: R$ {price:.2f}")
-            else:
-                print("✗ Elemento de preço não encontrado no site da Apple")
-        except Exception as e:
-            print(f"✗ Erro ao processar preço da Apple: {e}")
-    else:
-        # Lógica original para outros sites
-        price_elem = soup.find('h2', class_='price')
-        if price_elem:
-            # Remove o span interno se existir
-            span = price_elem.find('span')
-            if span:
-                span.decompose()
-            
-            # Pega o texto limpo
-            price_text = price_elem.get_text().strip()
-            try:
-                price_text = re.sub(r'[^\d,.]', '', price_text)
-                if ',' in price_text and '.' in price_text:
-                    price_text = price_text.replace('.', '').replace(',', '.')
-                else:
-                    price_text = price_text.replace(',', '.')
-                price = float(price_text)
-            except (ValueError, AttributeError):
-                price = None
+            price = parse_price_text(price_text, locale)
+            learned_selector = 'h2.price'
+        except (ValueError, AttributeError):
+            price = None
+        tier = 'h2.price'
+    
+    # Se não encontrou preço, tenta outros seletores
+    if not price:
+        tier = 'selector'
+        # Seletores específicos conhecidos
+        price_selectors = [
+            'h2.price',                    # Seu caso específico
+            'span.price-tag-fraction',     # Mercado Livre
+            'span.a-price-whole',          # Amazon
+            'p.price-template__text',      # Magalu
+            'div.priceSales',              # Americanas
+            'span.price',                  # Genérico
+            'div.product-price',           # Genérico
+            'p.price',                     # Genérico
+            'span.regular-price'           # Genérico
+        ]
+        
+        price, learned_selector = try_get_price_with_selector(soup, price_selectors, locale)
         
-        # Se não encontrou preço, tenta outros seletores
+        # Se ainda não encontrou, tenta busca genérica por classe price
         if not price:
-            # Seletores específicos conhecidos
-            price_selectors = [
-                'h2.price',                    # Seu caso específico
-                'span.price-tag-fraction',     # Mercado Livre
-                'span.a-price-whole',          # Amazon
-                'p.price-template__text',      # Magalu
-                'div.priceSales',              # Americanas
-                'span.price',                  # Genérico
-                'div.product-price',           # Genérico
-                'p.price',                     # Genérico
-                'span.regular-price'           # Genérico
-            ]
-            
-            price = try_get_price(soup, price_selectors)
-            
-            # Se ainda não encontrou, tenta busca genérica por classe price
-            if not price:
-                elements_with_price = soup.find_all(class_=lambda x: x and 'price' in x.lower())
-                for elem in elements_with_price:
-                    try:
-                        for child in elem.find_all(['span', 'small', 'sup', 'sub']):
-                            child.decompose()
-                        
-                        price_text = elem.get_text().strip()
-                        price_text = re.sub(r'[^\d,.]', '', price_text)
-                        
-                        if not any(c.isdigit() for c in price_text):
-                            continue
-                        
-                        if ',' in price_text and '.' in price_text:
-                            price_text = price_text.replace('.', '').replace(',', '.')
-                        else:
-                            price_text = price_text.replace(',', '.')
-                        
-                        price = float(price_text)
-                        if price > 0:
-                            print(f"Preço encontrado em elemento com classe: {elem.get('class')}")
-                            break
-                    except (ValueError, AttributeError) as e:
+            tier = 'generic'
+            elements_with_price = soup.find_all(class_=lambda x: x and 'price' in x.lower())
+            for elem in elements_with_price:
+                try:
+                    for child in elem.find_all(['span', 'small', 'sup', 'sub']):
+                        child.decompose()
+                    
+                    price_text = elem.get_text().strip()
+                    if not any(c.isdigit() for c in price_text):
                         continue
+                    
+                    price = parse_price_text(price_text, locale)
+                    if price > 0:
+                        print(f"Preço encontrado em elemento com classe: {elem.get('class')}")
+                        learned_selector = _class_selector(soup, elem)
+                        break
+                except (ValueError, AttributeError) as e:
+                    continue
 
-    return {
+    if price and learned_selector:
+        extraction_rules.record_success(domain, price_selector=learned_selector)
+    record_price_tier(tier if price else 'miss')
+    return price
+
+def fetch_product_info(product_url, use_cache=True, mode=FETCH_FULL):
+    """
+    Faz o scraping das informações do produto. Com use_cache, envia os
+    validadores HTTP salvos e reaproveita o último resultado quando a página
+    não mudou (304 ou corpo idêntico).
+
+    mode define o que é extraído: FETCH_PRICE só busca o preço (usado nas
+    atualizações agendadas) e FETCH_FULL também imagem, favicon e logo
+    (cadastro do link e metadados vencidos, ver refresh.needs_metadata).
+    """
+    required_fields = REQUIRED_CACHE_FIELDS[mode]
+    cache_entry = page_cache.load(product_url) if use_cache else None
+    response = http_client.get(product_url, headers=page_cache.conditional_headers(cache_entry, required_fields))
+    if use_cache:
+        cached_info = page_cache.lookup(product_url, response, cache_entry, required_fields)
+        if cached_info:
+            return cached_info
+
+    domain = urlparse(product_url).netloc
+    site_name = domain.replace('www.', '').split('.')[0].capitalize()
+
+    price = None
+    image_url = None
+    site_logos = {'favicon_url': None, 'logo_url': None}
+
+    # Dados estruturados (JSON-LD / OpenGraph / microdata) são lidos direto
+    # do HTML; no modo só-preço, um acerto dispensa a árvore inteira
+    structured = structured_data.extract(response.content)
+    if structured:
+        price = structured['price']
+        record_price_tier('structured')
+
+    if mode != FETCH_PRICE or not price:
+        # No modo só-preço, constrói apenas as regiões que podem conter o preço
+        soup = make_soup(response.content, parse_only=price_strainer(domain) if mode == FETCH_PRICE else None)
+
+        if mode == FETCH_FULL:
+            # Busca favicon, logo e imagem antes do preço, que remove nós da árvore
+            site_logos = get_site_logos(soup, domain)
+            image_url = find_product_image(soup, structured and structured['image_url'], domain)
+
+        if not price:
+            price = extract_price(soup, domain)
+
+    product_info = {
         'price': price,
         'image_url': image_url,
         'site_name': site_name,
         'favicon_url': site_logos['favicon_url'],
         'logo_url': site_logos['logo_url']
     }
+    if use_cache:
+        page_cache.save(product_url, response, product_info, MODE_FIELDS[mode])
+    return product_info
 
-def try_get_price(soup, selectors):
+def try_get_price_with_selector(soup, selectors, locale=extraction_rules.DEFAULT_LOCALE):
     """
-    Tenta obter o preço usando uma lista de seletores
+    Tenta obter o preço usando uma lista de seletores. Retorna (preço, seletor)
     """
     for selector in selectors:
         try:
@@ -360,45 +669,28 @@ def try_get_price(soup, selectors):
                 for child in price_elem.find_all(['span', 'small', 'sup', 'sub']):
                     child.decompose()
                 
-                price_text = price_elem.get_text().strip()
-                price_text = re.sub(r'[^\d,.]', '', price_text)
-                
-                if ',' in price_text and '.' in price_text:
-                    price_text = price_text.replace('.', '').replace(',', '.')
-                else:
-                    price_text = price_text.replace(',', '.')
-                
-                price = float(price_text)
+                price = parse_price_text(price_elem.get_text().strip(), locale)
                 if price > 0:  # Preço válido encontrado
                     print(f"Preço encontrado usando seletor: {selector}")
-                    return price
+                    return price, selector
         except (ValueError, AttributeError) as e:
             print(f"Erro ao processar seletor {selector}: {e}")
             continue
-    return None
+    return None, None
+
+def try_get_price(soup, selectors):
+    """
+    Tenta obter o preço usando uma lista de seletores
+    """
+    return try_get_price_with_selector(soup, selectors)[0]
 
 def update_prices():
     """
-    Atualiza os preços de todos os produtos
+    Atualiza os preços de todos os produtos (se nenhum outro processo
+    já estiver atualizando)
     """
-    conn, placeholder = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Busca todos os links
-    cursor.execute('SELECT id, product_url FROM product_links')
-    links = cursor.fetchall()
-    
-    for link_id, url in links:
-        try:
-            info = fetch_product_info(url)
-            if info['price']:
-                log_price(link_id, info['price'])
-                print(f"Preço atualizado para {url}: R$ {info['price']:.2f}")
-        except Exception as e:
-            print(f"Erro ao atualizar preço de {url}: {e}")
-    
-    cursor.close()
-    conn.close()
+    from scheduler import refresh_once
+    return refresh_once(fetch_product_info)[1]
 
 if __name__ == "__main__":
     update_prices()
@@ -15,6 +15,6 @@ setup(
         "Pillow>=11.0.0",
         "gunicorn>=23.0.0",
         "Authlib>=1.3.2",
-        "Flask-Caching>=2.1.0"
+        "cachelib>=0.9.0"
     ],
 ) 
\ No newline at end of file
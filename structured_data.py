@@ -0,0 +1,151 @@
+import re
+import json
+
+# Blocos JSON-LD e tags com metadados de preço, lidos direto do HTML bruto
+JSON_LD_RE = re.compile(
+    r'<script[^>]*type\s*=\s*["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL
+)
+META_TAG_RE = re.compile(r'<meta\b[^>]*>', re.IGNORECASE)
+ITEMPROP_TAG_RE = re.compile(r'<[a-z]+\b[^>]*\bitemprop\s*=\s*["\'](?:price|priceCurrency)["\'][^>]*>', re.IGNORECASE)
+ATTR_RE = re.compile(r'([a-zA-Z_:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+PRICE_META_KEYS = ('product:price:amount', 'og:price:amount', 'price')
+CURRENCY_META_KEYS = ('product:price:currency', 'og:price:currency', 'pricecurrency')
+IMAGE_META_KEYS = ('og:image', 'og:image:secure_url')
+
+
+def parse_price(value):
+    """
+    Converte o preço de um dado estruturado (número ou texto) para float
+    """
+    if isinstance(value, (int, float)):
+        return float(value) if value > 0 else None
+    if not isinstance(value, str):
+        return None
+    text = re.sub(r'[^\d,.]', '', value)
+    if not text:
+        return None
+    if ',' in text and '.' in text:
+        text = text.replace('.', '').replace(',', '.')
+    else:
+        text = text.replace(',', '.')
+    try:
+        price = float(text)
+    except ValueError:
+        return None
+    return price if price > 0 else None
+
+
+def _attrs(tag):
+    attrs = {}
+    for name, double_quoted, single_quoted in ATTR_RE.findall(tag):
+        attrs[name.lower()] = double_quoted or single_quoted
+    return attrs
+
+
+def _iter_json_ld_nodes(data):
+    """
+    Percorre listas, @graph e objetos aninhados de um bloco JSON-LD
+    """
+    if isinstance(data, list):
+        for item in data:
+            yield from _iter_json_ld_nodes(item)
+    elif isinstance(data, dict):
+        yield data
+        for key in ('@graph', 'mainEntity', 'itemOffered'):
+            if key in data:
+                yield from _iter_json_ld_nodes(data[key])
+
+
+def _is_type(node, *types):
+    node_type = node.get('@type')
+    if isinstance(node_type, list):
+        return any(t in types for t in node_type)
+    return node_type in types
+
+
+def _first_image(image):
+    if isinstance(image, list):
+        image = image[0] if image else None
+    if isinstance(image, dict):
+        image = image.get('url') or image.get('contentUrl')
+    return image if isinstance(image, str) else None
+
+
+def _offer_price(offers):
+    """
+    Retorna (preço, moeda) da primeira oferta com preço válido
+    """
+    if isinstance(offers, dict):
+        offers = [offers]
+    if not isinstance(offers, list):
+        return None, None
+    for offer in offers:
+        if not isinstance(offer, dict):
+            continue
+        for key in ('price', 'lowPrice'):
+            price = parse_price(offer.get(key))
+            if price:
+                return price, offer.get('priceCurrency')
+        spec = offer.get('priceSpecification')
+        if spec:
+            price, currency = _offer_price(spec)
+            if price:
+                return price, currency
+    return None, None
+
+
+def from_json_ld(html):
+    """
+    Busca preço, moeda e imagem em objetos schema.org Product/Offer
+    """
+    for block in JSON_LD_RE.findall(html):
+        try:
+            data = json.loads(block.strip())
+        except ValueError:
+            continue
+        for node in _iter_json_ld_nodes(data):
+            if _is_type(node, 'Product', 'ProductGroup'):
+                price, currency = _offer_price(node.get('offers'))
+                if price:
+                    return {'price': price, 'currency': currency, 'image_url': _first_image(node.get('image'))}
+            elif _is_type(node, 'Offer', 'AggregateOffer'):
+                price, currency = _offer_price(node)
+                if price:
+                    return {'price': price, 'currency': currency, 'image_url': None}
+    return None
+
+
+def from_meta_tags(html):
+    """
+    Busca preço em meta tags OpenGraph/product e em atributos itemprop
+    """
+    price = None
+    currency = None
+    image_url = None
+    for tag in META_TAG_RE.findall(html) + ITEMPROP_TAG_RE.findall(html):
+        attrs = _attrs(tag)
+        key = (attrs.get('property') or attrs.get('name') or attrs.get('itemprop') or '').lower()
+        content = attrs.get('content')
+        if not content:
+            continue
+        if key in PRICE_META_KEYS and not price:
+            price = parse_price(content)
+        elif key in CURRENCY_META_KEYS and not currency:
+            currency = content
+        elif key in IMAGE_META_KEYS and not image_url:
+            image_url = content
+    if price:
+        return {'price': price, 'currency': currency, 'image_url': image_url}
+    return None
+
+
+def extract(content):
+    """
+    Extrai preço/moeda/imagem de dados estruturados (JSON-LD, OpenGraph,
+    microdata) sem montar a árvore HTML. Retorna None se não houver preço.
+    """
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', errors='replace')
+    return from_json_ld(content) or from_meta_tags(content)
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Banco e cache do dashboard descartáveis, definidos antes de importar utils
+_tmp = tempfile.mkdtemp(prefix='appscraper-tests-')
+os.environ['DATABASE_PATH'] = os.path.join(_tmp, 'test.db')
+os.environ['DASHBOARD_CACHE_DIR'] = os.path.join(_tmp, 'cache')
@@ -0,0 +1,21 @@
+import refresh
+import utils
+
+
+def fetch(link):
+    with utils.get_db_connection() as conn:
+        conn.execute('SELECT 1').fetchone()
+    return {'price': 1.0}
+
+
+def test_refresh_threads_keep_connections_between_runs():
+    utils.init_db()
+    links = [{'id': str(i), 'product_url': f'https://loja{i % 4}.com.br/p/{i}'} for i in range(40)]
+    engine = refresh.RefreshEngine(fetch, max_workers=4)
+
+    engine.run(links, lambda link, info, error: error is None)
+    opened = utils._pool_stats['opened']
+    stats = engine.run(links, lambda link, info, error: error is None)
+
+    assert stats['ok'] == len(links)
+    assert utils._pool_stats['opened'] == opened
@@ -0,0 +1,29 @@
+from cachelib import FileSystemCache
+
+import dashboard_cache
+
+
+def test_invalidation_survives_eviction(tmp_path, monkeypatch):
+    cache = FileSystemCache(str(tmp_path), threshold=4, default_timeout=600)
+    monkeypatch.setattr(dashboard_cache, '_cache', cache)
+
+    assert dashboard_cache.get_or_compute('u1', lambda: 'v0') == ('v0', False)
+    assert dashboard_cache.get_or_compute('u1', lambda: 'v0') == ('v0', True)
+    dashboard_cache.invalidate(['u1'])
+
+    # Outros usuários enchem o cache e forçam a remoção de entradas
+    for i in range(10):
+        dashboard_cache.get_or_compute(f'other-{i}', lambda: 'x')
+
+    data, _ = dashboard_cache.get_or_compute('u1', lambda: 'v1')
+    assert data == 'v1'
+
+
+def test_missing_generation_never_reuses_old_entries(tmp_path, monkeypatch):
+    cache = FileSystemCache(str(tmp_path), threshold=100, default_timeout=600)
+    monkeypatch.setattr(dashboard_cache, '_cache', cache)
+
+    dashboard_cache.get_or_compute('u1', lambda: 'v0')
+    cache.delete(dashboard_cache._generation_key('u1'))
+
+    assert dashboard_cache.get_or_compute('u1', lambda: 'v1') == ('v1', False)
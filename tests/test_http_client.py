@@ -0,0 +1,99 @@
+import time
+import threading
+import http.server
+
+import pytest
+
+import http_client
+import ratelimit
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    hits = 0
+    status = 200
+    headers_out = {}
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        type(self).hits += 1
+        body = b'<html>ok</html>'
+        encoding = None
+        if self.path == '/br' and 'br' in self.headers.get('Accept-Encoding', ''):
+            import brotli
+            body, encoding = brotli.compress(body), 'br'
+        self.send_response(self.status)
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        for name, value in self.headers_out.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    StubHandler.hits = 0
+    monkeypatch.setattr(http_client, 'BACKOFF_FACTOR', 0)
+    monkeypatch.setattr(http_client, '_session', None)
+    monkeypatch.setitem(ratelimit.RATE_LIMITS, '127.0.0.1', {'rate': 1000, 'burst': 100, 'concurrency': 4})
+    monkeypatch.setattr(ratelimit, '_limiters', {})
+    yield f"http://127.0.0.1:{server.server_address[1]}", StubHandler
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize('status', [429, 503])
+def test_throttle_is_left_to_ratelimit(stub, monkeypatch, status):
+    url, handler = stub
+    monkeypatch.setattr(handler, 'status', status)
+    monkeypatch.setattr(handler, 'headers_out', {'Retry-After': '2'})
+
+    started = time.monotonic()
+    with pytest.raises(ratelimit.Blocked):
+        http_client.get(url + '/produto')
+
+    # Uma única requisição, sem dormir pelo Retry-After dentro do urllib3
+    assert handler.hits == 1
+    assert time.monotonic() - started < 1
+    assert ratelimit.get_limiter('127.0.0.1').blocked_until > time.monotonic() + 1
+
+
+def test_long_retry_after_rejects_instead_of_waiting(stub, monkeypatch):
+    url, handler = stub
+    monkeypatch.setattr(handler, 'status', 429)
+    monkeypatch.setattr(handler, 'headers_out', {'Retry-After': '600'})
+
+    with pytest.raises(ratelimit.Blocked):
+        http_client.get(url + '/produto')
+    started = time.monotonic()
+    with pytest.raises(ratelimit.Blocked):
+        http_client.get(url + '/produto')
+
+    assert handler.hits == 1
+    assert time.monotonic() - started < 1
+
+
+def test_transient_5xx_is_retried(stub, monkeypatch):
+    url, handler = stub
+    monkeypatch.setattr(handler, 'status', 502)
+
+    response = http_client.get(url + '/produto')
+
+    assert response.status_code == 502
+    assert handler.hits == http_client.MAX_RETRIES + 1
+
+
+def test_brotli_is_negotiated_and_decoded(stub):
+    pytest.importorskip('brotli')
+    url, handler = stub
+
+    response = http_client.get(url + '/br')
+
+    assert response.headers['Content-Encoding'] == 'br'
+    assert response.text == '<html>ok</html>'
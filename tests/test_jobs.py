@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import jobs
+import ratelimit
+import utils
+
+
+@pytest.fixture
+def job():
+    utils.init_db()
+    with utils.get_db_connection() as conn:
+        conn.execute('DELETE FROM scrape_jobs')
+        conn.commit()
+    jobs.enqueue('link-jobs', 'https://loja.com.br/p/1')
+    return jobs.claim()
+
+
+def _row(job_id):
+    with utils.get_db_connection() as conn:
+        return dict(conn.execute('SELECT * FROM scrape_jobs WHERE id = ?', (job_id,)).fetchone())
+
+
+def _make_due(job_id):
+    with utils.get_db_connection() as conn:
+        conn.execute('UPDATE scrape_jobs SET not_before = ? WHERE id = ?', (datetime.utcnow() - timedelta(seconds=1), job_id))
+        conn.commit()
+
+
+def test_blocked_job_waits_for_domain_backoff(job):
+    def blocked(url):
+        raise ratelimit.Blocked('loja.com.br em backoff por mais 600s', retry_after=600)
+
+    jobs.process(job, fetch=blocked)
+
+    row = _row(job['id'])
+    assert row['status'] == 'pending'
+    assert row['not_before'] >= str(datetime.utcnow() + timedelta(seconds=590))
+    # Não é pego de novo enquanto o domínio estiver em backoff
+    assert jobs.claim() is None
+
+
+def test_failures_back_off_before_giving_up(job):
+    def failing(url):
+        raise ValueError('boom')
+
+    for attempt in range(1, jobs.JOB_MAX_ATTEMPTS + 1):
+        assert job['attempts'] == attempt
+        jobs.process(job, fetch=failing)
+        if attempt < jobs.JOB_MAX_ATTEMPTS:
+            assert jobs.claim() is None
+            _make_due(job['id'])
+            job = jobs.claim()
+
+    assert _row(job['id'])['status'] == 'failed'
+
+
+def test_retry_delay_grows_and_is_capped():
+    assert jobs.retry_delay(1) == jobs.JOB_RETRY_BASE_SECONDS
+    assert jobs.retry_delay(2) == jobs.JOB_RETRY_BASE_SECONDS * 2
+    assert jobs.retry_delay(50) == jobs.JOB_RETRY_MAX_SECONDS
@@ -0,0 +1,17 @@
+import sqlite3
+
+import migrations
+import utils
+
+
+def test_init_db_on_current_schema_takes_no_write_lock():
+    utils.init_db()
+    other = sqlite3.connect(utils.DB_PATH, timeout=0.1, isolation_level=None)
+    other.execute('BEGIN IMMEDIATE')
+    try:
+        # Outro processo segurando o lock de escrita não bloqueia o init_db
+        utils.init_db()
+        assert migrations.apply_migrations() == []
+    finally:
+        other.execute('ROLLBACK')
+        other.close()
@@ -0,0 +1,46 @@
+import pytest
+
+import extraction_rules
+import scraper
+
+WRAPPER_PAGE = b'<div class="price-box"><span>R$</span></div><div class="price-box">10,00</div>'
+
+
+@pytest.fixture
+def rules(monkeypatch):
+    writes = []
+    monkeypatch.setattr(extraction_rules, '_configured', {})
+    monkeypatch.setattr(extraction_rules, '_learned', {})
+    monkeypatch.setattr(extraction_rules, '_misses', {})
+    monkeypatch.setattr(extraction_rules, 'get_db_connection', lambda: pytest.fail('acesso inesperado ao banco'))
+
+    def record_success(domain, **selectors):
+        writes.append(selectors)
+        extraction_rules._learned[extraction_rules.normalize_domain(domain)] = selectors
+    monkeypatch.setattr(extraction_rules, 'record_success', record_success)
+    monkeypatch.setattr(extraction_rules, 'forget', lambda domain, field: writes.append(('forget', field)))
+    return writes
+
+
+def test_ambiguous_class_is_not_learned(rules):
+    for _ in range(3):
+        assert scraper.extract_price(scraper.make_soup(WRAPPER_PAGE), 'loja.com.br') == 10.0
+    assert rules == []
+
+
+def test_learned_selector_is_reused(rules):
+    page = b'<div class="box"></div><span class="price-now">R$ 25,90</span>'
+    for _ in range(3):
+        assert scraper.extract_price(scraper.make_soup(page), 'loja.com.br') == pytest.approx(25.90)
+    assert rules == [{'price_selector': 'span.price-now'}]
+
+
+def test_selector_forgotten_only_after_repeated_misses(rules):
+    extraction_rules._learned['loja.com.br'] = {'price_selector': 'span.price-now'}
+    out_of_stock = scraper.make_soup(b'<p>Esgotado</p>')
+    for _ in range(extraction_rules.RULE_MAX_MISSES - 1):
+        scraper.extract_price(out_of_stock, 'loja.com.br')
+    assert rules == []
+
+    scraper.extract_price(out_of_stock, 'loja.com.br')
+    assert rules == [('forget', 'price_selector')]
@@ -0,0 +1,31 @@
+import pytest
+
+import scraper
+
+PAGE = (
+    b'<html><body><div class="produto">'
+    b'<span class="preco-por">R$ 1.234,56</span>'
+    b'<span id="priceblock_ourprice">R$ 99,90</span>'
+    b'<meta itemprop="price" content="10.00">'
+    b'</div></body></html>'
+)
+
+
+@pytest.mark.parametrize('selector, expected', [
+    ('span.preco-por', 1234.56),
+    ('#priceblock_ourprice', 99.90),
+    ('div.produto span.preco-por', 1234.56),
+    ('div.produto > #priceblock_ourprice', 99.90),
+])
+def test_rule_selector_survives_price_only_parse(monkeypatch, selector, expected):
+    monkeypatch.setattr(scraper.extraction_rules, 'get_rule', lambda domain: {'price_selector': selector})
+
+    soup = scraper.make_soup(PAGE, parse_only=scraper.price_strainer('loja.com.br'))
+    price, _ = scraper.try_get_price_with_selector(soup, [selector])
+
+    assert price == pytest.approx(expected)
+
+
+def test_default_strainer_without_rule(monkeypatch):
+    monkeypatch.setattr(scraper.extraction_rules, 'get_rule', lambda domain: {'locale': 'pt_BR'})
+    assert scraper.price_strainer('loja.com.br') is scraper.PRICE_STRAINER
@@ -0,0 +1,141 @@
+"""
+Confere com EXPLAIN QUERY PLAN as consultas que as funções realmente
+executam: o SQL é capturado com set_trace_callback enquanto cada função roda
+sobre um banco com dados, e nenhuma consulta pode varrer uma tabela inteira.
+"""
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+import jobs
+import refresh
+import utils
+
+# Varreduras aceitas: de subconsultas já filtradas (não de tabelas) e a
+# contagem total de links, feita uma vez por ciclo de atualização
+ALLOWED_SCANS = ('SCAN CONSTANT ROW', 'SCAN (subquery')
+ALLOWED_SQL = ('SELECT COUNT(*) FROM product_links',)
+PLANNED_PREFIXES = ('SELECT', 'UPDATE', 'DELETE', 'WITH', 'INSERT')
+
+
+@pytest.fixture(scope='module')
+def data():
+    utils.init_db()
+    user_id = str(uuid.uuid4())
+    with utils.get_db_connection() as conn:
+        conn.execute("INSERT INTO users (id, email, name) VALUES (?, ?, ?)", (user_id, 'plans@example.com', 'Plans'))
+        conn.commit()
+    product_ids = [utils.add_product(f'Produto {i}', user_id) for i in range(3)]
+    link_ids = []
+    for i, product_id in enumerate(product_ids):
+        for store in range(3):
+            link_ids.append(utils.add_product_link(product_id, f'https://loja{store}.com.br/p/{i}', f'Loja{store}'))
+
+    # Histórico com pontos brutos recentes e agregados antigos
+    start = datetime.utcnow() - timedelta(days=200)
+    with utils.get_db_connection() as conn:
+        cursor = conn.cursor()
+        for n, link_id in enumerate(link_ids):
+            cursor.executemany(
+                'INSERT INTO price_history (link_id, price, timestamp) VALUES (?, ?, ?)',
+                [
+                    (link_id, 100.0 + (day + n) % 7, (start + timedelta(days=day)).strftime(utils.TIMESTAMP_FORMAT))
+                    for day in range(200)
+                ]
+            )
+        utils.rebuild_price_rollups(cursor)
+        conn.commit()
+    jobs.enqueue(link_ids[0], 'https://loja0.com.br/p/0')
+    return {'user_id': user_id, 'product_ids': product_ids, 'link_ids': link_ids}
+
+
+@contextmanager
+def captured_sql():
+    """
+    Captura o SQL executado na conexão da thread atual (a mesma usada pelas
+    funções chamadas dentro do bloco)
+    """
+    statements = []
+    with utils.get_db_connection() as conn:
+        conn.set_trace_callback(statements.append)
+        try:
+            yield statements
+        finally:
+            conn.set_trace_callback(None)
+
+
+def full_scans(statements):
+    """
+    Retorna (sql, passo) de cada consulta capturada cujo plano varre uma
+    tabela inteira
+    """
+    problems = []
+    with utils.get_db_connection() as conn:
+        for sql in statements:
+            if not sql.lstrip().upper().startswith(PLANNED_PREFIXES) or sql.strip() in ALLOWED_SQL:
+                continue
+            for row in conn.execute('EXPLAIN QUERY PLAN ' + sql):
+                step = row[3]
+                if step.startswith('SCAN') and not step.startswith(ALLOWED_SCANS):
+                    problems.append((' '.join(sql.split()), step))
+    return problems
+
+
+def run_and_check(func):
+    with captured_sql() as statements:
+        func()
+    assert statements, 'nenhuma consulta capturada'
+    assert full_scans(statements) == []
+    return statements
+
+
+def test_get_user_products(data):
+    statements = run_and_check(lambda: utils.get_user_products(data['user_id']))
+    # A consulta de links com as subconsultas de preço atual e job pendente
+    assert any('current_price' in sql and 'pending_job_id' in sql for sql in statements)
+
+
+@pytest.mark.parametrize('resolution', utils.HISTORY_RESOLUTIONS)
+def test_get_link_history(data, resolution):
+    run_and_check(lambda: utils.get_link_history(data['link_ids'][0], data['user_id'], None, resolution, 50))
+
+
+def test_check_link_exists(data):
+    run_and_check(lambda: utils.check_link_exists('https://loja1.com.br/p/1'))
+
+
+def test_log_price(data):
+    run_and_check(lambda: utils.log_price(data['link_ids'][1], 123.45))
+
+
+def test_get_best_price_link(data):
+    run_and_check(lambda: utils.get_best_price_link(data['product_ids'][0]))
+
+
+def test_get_user_by_id(data, monkeypatch):
+    monkeypatch.setattr(utils, 'USER_CACHE_TTL', 0)
+    run_and_check(lambda: utils.get_user_by_id(data['user_id']))
+
+
+def test_jobs_queue(data):
+    def claim_and_read():
+        job = jobs.claim()
+        jobs.get_job(job['id'], data['user_id'])
+        jobs.requeue_stale()
+    run_and_check(claim_and_read)
+
+
+def test_refresh_cycle(data):
+    statements = run_and_check(lambda: refresh.refresh_all_prices(
+        lambda url, mode=None: {'price': 99.0, 'image_url': 'i', 'favicon_url': 'f', 'logo_url': 'l'}
+    ))
+    assert any('next_check_at' in sql for sql in statements)
+
+
+def test_delete_functions(data):
+    def delete():
+        utils.delete_product_link(data['link_ids'][-1])
+        utils.delete_product_and_links(data['product_ids'][-1])
+    run_and_check(delete)
@@ -0,0 +1,70 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+import refresh
+import utils
+from scraper import FETCH_FULL, FETCH_PRICE
+
+
+@pytest.fixture
+def link_id(monkeypatch):
+    monkeypatch.setattr(refresh, 'ADAPTIVE_REFRESH', False)
+    utils.init_db()
+    with utils.get_db_connection() as conn:
+        conn.execute('DELETE FROM product_links')
+        conn.commit()
+    user_id = str(uuid.uuid4())
+    with utils.get_db_connection() as conn:
+        conn.execute("INSERT INTO users (id, email, name) VALUES (?, ?, ?)", (user_id, f'{user_id}@example.com', 'Meta'))
+        conn.commit()
+    product_id = utils.add_product('Produto', user_id)
+    return utils.add_product_link(product_id, 'https://loja.com.br/p/meta', 'Loja')
+
+
+def run_cycle(image_url):
+    modes = []
+
+    def fetch(url, mode):
+        modes.append(mode)
+        return {'price': 10.0, 'image_url': image_url if mode == FETCH_FULL else None,
+                'favicon_url': 'f' if mode == FETCH_FULL else None, 'logo_url': None}
+    refresh.refresh_all_prices(fetch)
+    return modes
+
+
+def _link(link_id):
+    with utils.get_db_connection() as conn:
+        return dict(conn.execute('SELECT * FROM product_links WHERE id = ?', (link_id,)).fetchone())
+
+
+def test_metadata_is_refetched_only_when_stale(link_id):
+    # Página sem imagem válida: não repete o scraping completo a cada ciclo
+    assert run_cycle(image_url=None) == [FETCH_FULL]
+    assert run_cycle(image_url=None) == [FETCH_PRICE]
+
+    stale = datetime.utcnow() - timedelta(hours=refresh.METADATA_TTL_HOURS + 1)
+    with utils.get_db_connection() as conn:
+        conn.execute('UPDATE product_links SET metadata_updated_at = ? WHERE id = ?', (stale, link_id))
+        conn.commit()
+    assert run_cycle(image_url='https://loja.com.br/img.jpg') == [FETCH_FULL]
+    assert _link(link_id)['image_url'] == 'https://loja.com.br/img.jpg'
+
+
+def test_missing_image_keeps_previous_value(link_id):
+    run_cycle(image_url='https://loja.com.br/img.jpg')
+    with utils.get_db_connection() as conn:
+        conn.execute('UPDATE product_links SET metadata_updated_at = NULL WHERE id = ?', (link_id,))
+        conn.commit()
+
+    run_cycle(image_url=None)
+
+    assert _link(link_id)['image_url'] == 'https://loja.com.br/img.jpg'
+
+
+def test_needs_metadata():
+    now = datetime(2024, 1, 10)
+    assert refresh.needs_metadata({'metadata_updated_at': None}, now)
+    assert not refresh.needs_metadata({'metadata_updated_at': '2024-01-09 00:00:00.123456'}, now)
+    assert refresh.needs_metadata({'metadata_updated_at': '2023-12-01 00:00:00'}, now)
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+import utils
+
+
+def test_rebuild_matches_incremental_rollups():
+    utils.init_db()
+    start = datetime(2024, 1, 1, 8)
+    rows = []
+    for n, link_id in enumerate(('rollup-a', 'rollup-b')):
+        for i in range(60):
+            timestamp = start + timedelta(hours=7 * i + n)
+            last_seen = timestamp + timedelta(hours=5) if i % 3 == 0 else (timestamp if i % 3 == 1 else None)
+            rows.append((link_id, float((i * 7 + n) % 11), timestamp, last_seen))
+
+    with utils.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM price_history WHERE link_id LIKE 'rollup-%'")
+        cursor.executemany('''
+            INSERT INTO price_history (link_id, price, timestamp, last_seen)
+            VALUES (?, ?, ?, ?)
+        ''', rows)
+
+        utils.rebuild_price_rollups(cursor)
+        rebuilt = cursor.execute("SELECT * FROM price_rollups WHERE link_id LIKE 'rollup-%' ORDER BY 1, 2, 3").fetchall()
+
+        cursor.execute('DELETE FROM price_rollups')
+        utils._update_rollups(cursor, [
+            (link_id, price, timestamp)
+            for link_id, row_price, row_timestamp, last_seen in rows
+            for price, timestamp in utils.price_points([(row_price, row_timestamp, last_seen)])
+        ])
+        incremental = cursor.execute("SELECT * FROM price_rollups WHERE link_id LIKE 'rollup-%' ORDER BY 1, 2, 3").fetchall()
+        conn.rollback()
+
+    assert [tuple(row) for row in rebuilt] == [tuple(row) for row in incremental]
+    assert {row['resolution'] for row in rebuilt} == {'day', 'week'}
@@ -1,28 +1,140 @@
 import os
+import time
+import atexit
 import sqlite3
-from datetime import datetime
+import threading
+import weakref
+from datetime import datetime, date, timedelta
 import bcrypt
 from contextlib import contextmanager
 import uuid
+from collections import OrderedDict
+import dashboard_cache
+
+DB_PATH = os.getenv('DATABASE_PATH', 'appscraper.db')
+
+# Ajustes do SQLite aplicados a cada conexão do pool
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 10000))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 16384))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+
+# Limites do buffer de gravação de preços (PriceWriter)
+PRICE_BATCH_SIZE = int(os.getenv('PRICE_BATCH_SIZE', 500))
+PRICE_BATCH_SECONDS = float(os.getenv('PRICE_BATCH_SECONDS', 5))
+
+# 'changes' só insere uma linha quando o preço muda (senão estende o
+# last_seen da última linha); 'append' grava uma linha a cada verificação
+PRICE_STORAGE_MODE = os.getenv('PRICE_STORAGE_MODE', 'changes')
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Cache em memória dos usuários carregados pelo flask_login (0 desativa)
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 60))
+USER_CACHE_MAX_ENTRIES = int(os.getenv('USER_CACHE_MAX_ENTRIES', 1024))
+
+# Resolução do histórico no dashboard: pontos brutos nas últimas
+# RAW_HISTORY_HOURS, agregados diários até DAILY_HISTORY_DAYS e semanais depois
+RAW_HISTORY_HOURS = int(os.getenv('RAW_HISTORY_HOURS', 48))
+DAILY_HISTORY_DAYS = int(os.getenv('DAILY_HISTORY_DAYS', 90))
+
+_local = threading.local()
+_pool_lock = threading.Lock()
+_pool_stats = {'opened': 0, 'closed': 0, 'reused': 0}
+
+
+def _count(key):
+    with _pool_lock:
+        _pool_stats[key] += 1
+
+
+class _PooledConnection:
+    """
+    Conexão de longa duração de uma thread. É fechada quando a thread termina
+    e nunca é reaproveitada por um processo filho (fork do gunicorn).
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.depth = 0
+        self.conn = sqlite3.connect(DB_PATH, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+        self.conn.row_factory = sqlite3.Row  # Permite acessar colunas pelo nome
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}')
+        self.conn.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+        _count('opened')
+
+    def close(self):
+        if self.conn is not None and self.pid == os.getpid():
+            self.conn.close()
+            _count('closed')
+        self.conn = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def _get_pooled_connection():
+    pooled = getattr(_local, 'pooled', None)
+    if pooled is not None and pooled.conn is not None and pooled.pid == os.getpid():
+        _count('reused')
+        return pooled
+    pooled = _PooledConnection()
+    _local.pooled = pooled
+    return pooled
+
 
 @contextmanager
 def get_db_connection():
     """
-    Cria e retorna uma conexão com o SQLite
+    Retorna a conexão SQLite da thread atual, aberta uma única vez e mantida
+    para as próximas chamadas. Transações não confirmadas são desfeitas ao
+    sair do bloco mais externo, como acontecia ao fechar a conexão.
     """
-    conn = sqlite3.connect('appscraper.db')
-    conn.row_factory = sqlite3.Row  # Permite acessar colunas pelo nome
+    pooled = _get_pooled_connection()
+    pooled.depth += 1
     try:
-        yield conn
+        yield pooled.conn
     finally:
-        conn.close()
+        pooled.depth -= 1
+        if pooled.depth == 0 and pooled.conn.in_transaction:
+            pooled.conn.rollback()
+
+
+def close_db_connection():
+    """
+    Fecha a conexão da thread atual (ex.: ao encerrar um worker)
+    """
+    pooled = getattr(_local, 'pooled', None)
+    if pooled is not None:
+        pooled.close()
+        _local.pooled = None
+
+
+def get_pool_stats():
+    """
+    Retorna os contadores do pool de conexões deste processo
+    """
+    with _pool_lock:
+        stats = dict(_pool_stats)
+    stats['active'] = stats['opened'] - stats['closed']
+    stats['pid'] = os.getpid()
+    return stats
 
 def init_db():
     """
-    Inicializa as tabelas necessárias no SQLite
+    Inicializa as tabelas necessárias no SQLite. Com todas as migrações já
+    aplicadas não faz nada além de ler a versão do schema.
     """
+    from migrations import apply_migrations, schema_is_current
     with get_db_connection() as conn:
         cursor = conn.cursor()
+        if schema_is_current(cursor):
+            return
         
         # Criação das tabelas
         cursor.executescript('''
@@ -66,11 +178,86 @@ def init_db():
                 FOREIGN KEY (link_id) REFERENCES product_links(id)
             );
 
+            CREATE TABLE IF NOT EXISTS page_cache (
+                product_url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                content_length INTEGER,
+                price REAL,
+                image_url TEXT,
+                site_name TEXT,
+                favicon_url TEXT,
+                logo_url TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+
+            CREATE TABLE IF NOT EXISTS image_cache (
+                image_url TEXT PRIMARY KEY,
+                width INTEGER NOT NULL,
+                height INTEGER NOT NULL,
+                bytes INTEGER,
+                content_type TEXT,
+                probed_at TIMESTAMP NOT NULL,
+                last_used_at TIMESTAMP NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS site_logos (
+                domain TEXT PRIMARY KEY,
+                favicon_url TEXT,
+                logo_url TEXT,
+                updated_at TIMESTAMP NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS extraction_rules (
+                domain TEXT PRIMARY KEY,
+                price_selector TEXT,
+                image_selector TEXT,
+                locale TEXT,
+                updated_at TIMESTAMP NOT NULL
+            );
+
             CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
             CREATE INDEX IF NOT EXISTS idx_product_links_url ON product_links(product_url);
+            CREATE INDEX IF NOT EXISTS idx_image_cache_last_used ON image_cache(last_used_at);
         ''')
         conn.commit()
 
+        # Aplica as migrações versionadas (índices, colunas novas)
+        apply_migrations(conn)
+
+def _link_owners(cursor, link_ids):
+    """
+    Retorna os usuários donos dos links (para invalidar o cache do dashboard)
+    """
+    link_ids = list(set(link_ids))
+    owners = set()
+    for start in range(0, len(link_ids), 500):
+        chunk = link_ids[start:start + 500]
+        cursor.execute(f'''
+            SELECT DISTINCT p.user_id
+            FROM product_links pl
+            JOIN products p ON pl.product_id = p.id
+            WHERE pl.id IN ({', '.join('?' * len(chunk))})
+        ''', chunk)
+        owners.update(row[0] for row in cursor.fetchall())
+    return owners
+
+def invalidate_link_dashboards(link_ids):
+    """
+    Invalida o cache do dashboard dos donos dos links
+    """
+    try:
+        with get_db_connection() as conn:
+            dashboard_cache.invalidate(_link_owners(conn.cursor(), link_ids))
+    except Exception as e:
+        print(f"Erro ao invalidar cache do dashboard: {e}")
+
+def _product_owner(cursor, product_id):
+    cursor.execute('SELECT user_id FROM products WHERE id = ?', (product_id,))
+    row = cursor.fetchone()
+    return {row[0]} if row else set()
+
 def add_product(product_name, user_id):
     """
     Adiciona um novo produto ao SQLite
@@ -83,6 +270,7 @@ def add_product(product_name, user_id):
             VALUES (?, ?, ?)
         ''', (product_id, product_name, user_id))
         conn.commit()
+        dashboard_cache.invalidate([user_id])
         return product_id
 
 def add_product_link(product_id, product_url, site_name, image_url=None, favicon_url=None, logo_url=None):
@@ -124,23 +312,319 @@ def add_product_link(product_id, product_url, site_name, image_url=None, favicon
             datetime.utcnow()
         ))
         conn.commit()
+        dashboard_cache.invalidate(_product_owner(cursor, product_id))
         return link_id
 
+def _last_price(cursor, link_id):
+    """
+    Retorna (id, preço) da linha mais recente do histórico do link
+    """
+    cursor.execute('''
+        SELECT id, price
+        FROM price_history
+        WHERE link_id = ?
+        ORDER BY timestamp DESC, id DESC
+        LIMIT 1
+    ''', (link_id,))
+    row = cursor.fetchone()
+    return (row['id'], row['price']) if row else None
+
+def _store_prices(cursor, prices):
+    """
+    Grava uma lista de (link_id, preço, timestamp) no histórico. No modo
+    'changes', um preço igual ao último só estende o last_seen da linha
+    existente; caso contrário insere uma nova linha. Os agregados diários e
+    semanais recebem todas as verificações. Retorna os links cujo preço
+    atual mudou.
+    """
+    _update_rollups(cursor, prices)
+    if PRICE_STORAGE_MODE != 'changes':
+        cursor.executemany('''
+            INSERT INTO price_history (link_id, price, timestamp)
+            VALUES (?, ?, ?)
+        ''', prices)
+        return {link_id for link_id, _, _ in prices}
+
+    last = {}
+    extended = []
+    changed = set()
+    for link_id, price, timestamp in prices:
+        if link_id not in last:
+            last[link_id] = _last_price(cursor, link_id)
+        current = last[link_id]
+        if current and current[1] == price:
+            extended.append((timestamp, current[0]))
+            continue
+        cursor.execute('''
+            INSERT INTO price_history (link_id, price, timestamp, last_seen)
+            VALUES (?, ?, ?, ?)
+        ''', (link_id, price, timestamp, timestamp))
+        last[link_id] = (cursor.lastrowid, price)
+        changed.add(link_id)
+    cursor.executemany('''
+        UPDATE price_history
+        SET last_seen = ?
+        WHERE id = ?
+    ''', extended)
+    return changed
+
+def rollup_buckets(timestamp):
+    """
+    Retorna os baldes (resolução, data inicial) de um timestamp: o dia e a
+    semana (começando na segunda-feira)
+    """
+    day = date.fromisoformat(str(timestamp)[:10])
+    return (('day', day.isoformat()), ('week', (day - timedelta(days=day.weekday())).isoformat()))
+
+def _update_rollups(cursor, prices):
+    """
+    Atualiza incrementalmente mínimo, máximo e último preço dos baldes
+    diário e semanal de cada (link_id, preço, timestamp)
+    """
+    cursor.executemany('''
+        INSERT INTO price_rollups (link_id, resolution, bucket, min_price, max_price, last_price, last_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(link_id, resolution, bucket) DO UPDATE SET
+            min_price = MIN(min_price, excluded.min_price),
+            max_price = MAX(max_price, excluded.max_price),
+            last_price = CASE WHEN excluded.last_at >= last_at THEN excluded.last_price ELSE last_price END,
+            last_at = MAX(last_at, excluded.last_at)
+    ''', (
+        (link_id, resolution, bucket, price, price, price, timestamp)
+        for link_id, price, timestamp in prices
+        for resolution, bucket in rollup_buckets(timestamp)
+    ))
+
+def rebuild_price_rollups(cursor):
+    """
+    Recalcula os agregados a partir do histórico bruto (usado pela migração
+    que cria a tabela). Faixas do modo 'changes' contribuem com o ponto
+    inicial e o final, como em price_points. Tudo roda no SQLite: o
+    histórico não passa pelo Python nem fica inteiro em memória.
+    """
+    cursor.execute('DELETE FROM price_rollups')
+    cursor.execute('''
+        WITH points AS (
+            SELECT id, link_id, price, timestamp AS at, substr(timestamp, 1, 10) AS day, timestamp AS origin, 0 AS seq
+            FROM price_history
+            UNION ALL
+            SELECT id, link_id, price, last_seen, substr(last_seen, 1, 10), timestamp, 1
+            FROM price_history
+            WHERE last_seen IS NOT NULL AND last_seen != timestamp
+        ),
+        buckets AS (
+            SELECT id, link_id, price, at, origin, seq, 'day' AS resolution, day AS bucket
+            FROM points
+            UNION ALL
+            -- Semana começando na segunda-feira (%w: domingo = 0)
+            SELECT id, link_id, price, at, origin, seq, 'week', date(day, '-' || ((strftime('%w', day) + 6) % 7) || ' days')
+            FROM points
+        ),
+        ranked AS (
+            SELECT link_id, resolution, bucket, price, at,
+                   FIRST_VALUE(price) OVER (
+                       PARTITION BY link_id, resolution, bucket
+                       -- Empate no horário: vale o ponto gravado por último
+                       ORDER BY at DESC, origin DESC, id DESC, seq DESC
+                   ) AS last_price
+            FROM buckets
+        )
+        INSERT INTO price_rollups (link_id, resolution, bucket, min_price, max_price, last_price, last_at)
+        SELECT link_id, resolution, bucket, MIN(price), MAX(price), MAX(last_price), MAX(at)
+        FROM ranked
+        GROUP BY link_id, resolution, bucket
+    ''')
+
 def log_price(link_id, price):
     """
     Registra um novo preço no histórico
     """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        changed = _store_prices(cursor, [(link_id, float(price), datetime.utcnow().strftime(TIMESTAMP_FORMAT))])
+        conn.commit()
+        if changed:
+            dashboard_cache.invalidate(_link_owners(cursor, changed))
+
+def price_points(rows):
+    """
+    Converte linhas (price, timestamp, last_seen) do histórico em pontos
+    (preço, data): cada faixa de preço estável vira o ponto inicial e o
+    final, o que mantém o gráfico igual ao do histórico hora a hora
+    """
+    for price, timestamp, last_seen in rows:
+        yield price, timestamp
+        if last_seen and last_seen != timestamp:
+            yield price, last_seen
+
+def compact_price_history():
+    """
+    Compacta o histórico existente: sequências consecutivas do mesmo preço
+    em um link viram uma única linha com timestamp (primeira vez visto) e
+    last_seen (última vez visto). Retorna a quantidade de linhas removidas.
+    """
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('''
-            INSERT INTO price_history (link_id, price)
-            VALUES (?, ?)
-        ''', (link_id, float(price)))
+            SELECT id, link_id, price, timestamp, last_seen
+            FROM price_history
+            ORDER BY link_id, timestamp, id
+        ''')
+        extended = []
+        removed = []
+        run = None
+        for row_id, link_id, price, timestamp, last_seen in cursor:
+            seen = last_seen or timestamp
+            if run and run['link_id'] == link_id and run['price'] == price:
+                run['last_seen'] = max(run['last_seen'], seen)
+                removed.append((row_id,))
+                continue
+            if run:
+                extended.append((run['last_seen'], run['id']))
+            run = {'id': row_id, 'link_id': link_id, 'price': price, 'last_seen': seen}
+        if run:
+            extended.append((run['last_seen'], run['id']))
+
+        cursor.executemany('UPDATE price_history SET last_seen = ? WHERE id = ?', extended)
+        cursor.executemany('DELETE FROM price_history WHERE id = ?', removed)
         conn.commit()
+        return len(removed)
+
+# Colunas de product_links que o PriceWriter pode atualizar
+LINK_UPDATE_FIELDS = ('image_url', 'favicon_url', 'logo_url', 'site_name', 'last_update', 'metadata_updated_at')
+
+_price_writers = weakref.WeakSet()
+
+class PriceWriter:
+    """
+    Acumula preços e atualizações de links e grava tudo em uma única
+    transação (executemany) ao atingir max_batch itens ou max_delay segundos,
+    ao sair do bloco with ou no encerramento do processo.
+    """
+
+    def __init__(self, max_batch=PRICE_BATCH_SIZE, max_delay=PRICE_BATCH_SECONDS):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._prices = []
+        self._link_updates = {}
+        self._first_pending = None
+        self._lock = threading.Lock()
+        self.flushed_prices = 0
+        self.flushes = 0
+        _price_writers.add(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+    def add_price(self, link_id, price, timestamp=None):
+        """
+        Enfileira um preço para o histórico
+        """
+        timestamp = timestamp or datetime.utcnow()
+        with self._lock:
+            self._prices.append((link_id, float(price), timestamp.strftime(TIMESTAMP_FORMAT)))
+            self._mark_pending()
+        self._maybe_flush()
+
+    def update_link(self, link_id, **fields):
+        """
+        Enfileira a atualização de colunas de um link (a última vence)
+        """
+        fields = {field: value for field, value in fields.items() if field in LINK_UPDATE_FIELDS}
+        if not fields:
+            return
+        with self._lock:
+            self._link_updates.setdefault(link_id, {}).update(fields)
+            self._mark_pending()
+        self._maybe_flush()
+
+    def _mark_pending(self):
+        if self._first_pending is None:
+            self._first_pending = time.monotonic()
+
+    def _maybe_flush(self):
+        with self._lock:
+            pending = len(self._prices) + len(self._link_updates)
+            due = pending >= self.max_batch or (
+                self._first_pending is not None and time.monotonic() - self._first_pending >= self.max_delay
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Grava o que estiver no buffer em uma única transação
+        """
+        with self._lock:
+            prices, self._prices = self._prices, []
+            link_updates, self._link_updates = self._link_updates, {}
+            self._first_pending = None
+        if not prices and not link_updates:
+            return
+
+        # Agrupa as atualizações pelo conjunto de colunas para usar executemany
+        grouped = {}
+        for link_id, fields in link_updates.items():
+            columns = tuple(sorted(fields))
+            grouped.setdefault(columns, []).append(tuple(fields[c] for c in columns) + (link_id,))
+
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                changed = _store_prices(cursor, prices)
+                for columns, rows in grouped.items():
+                    assignments = ', '.join(f'{column} = ?' for column in columns)
+                    cursor.executemany(f'UPDATE product_links SET {assignments} WHERE id = ?', rows)
+                conn.commit()
+        except Exception:
+            # Devolve os itens ao buffer para a próxima tentativa
+            with self._lock:
+                self._prices = prices + self._prices
+                for link_id, fields in link_updates.items():
+                    newer = self._link_updates.setdefault(link_id, {})
+                    for field, value in fields.items():
+                        newer.setdefault(field, value)
+                self._mark_pending()
+            raise
+
+        self.flushed_prices += len(prices)
+        self.flushes += 1
+
+        # Dashboards afetados: preço atual mudou ou imagem/favicon/logo/site mudaram
+        changed |= {link_id for link_id, fields in link_updates.items() if set(fields) - {'last_update'}}
+        if changed:
+            invalidate_link_dashboards(changed)
+
+def _flush_price_writers():
+    for writer in list(_price_writers):
+        try:
+            writer.flush()
+        except Exception as e:
+            print(f"Erro ao gravar preços pendentes no encerramento: {e}")
+
+atexit.register(_flush_price_writers)
+
+def history_cutoffs(now=None):
+    """
+    Retorna (raw_start, daily_start): início dos pontos brutos (meia-noite do
+    dia de corte, para não deixar um dia pela metade) e início dos agregados
+    diários (segunda-feira da semana de corte, para só usar semanas completas)
+    """
+    now = now or datetime.utcnow()
+    raw_day = (now - timedelta(hours=RAW_HISTORY_HOURS)).date()
+    daily_day = (now - timedelta(days=DAILY_HISTORY_DAYS)).date()
+    daily_day -= timedelta(days=daily_day.weekday())
+    return f"{raw_day.isoformat()} 00:00:00", daily_day.isoformat()
 
 def get_user_products(user_id):
     """
-    Retorna todos os produtos do usuário com seus links e histórico de preços
+    Retorna todos os produtos do usuário com seus links, o preço atual de
+    cada link e o job de scraping pendente. Usa um número fixo de consultas,
+    independente da quantidade de produtos. O histórico de preços de cada
+    link é carregado à parte, por get_link_history.
     """
     with get_db_connection() as conn:
         cursor = conn.cursor()
@@ -153,47 +637,139 @@ def get_user_products(user_id):
             ORDER BY created_at DESC
         ''', (user_id,))
         products = [dict(row) for row in cursor.fetchall()]
-        
-        # Para cada produto, busca seus links e histórico de preços
+        products_by_id = {}
         for product in products:
-            cursor.execute('''
-                SELECT pl.*, 
-                       GROUP_CONCAT(ph.price) as prices,
-                       GROUP_CONCAT(ph.timestamp) as dates
-                FROM product_links pl
-                LEFT JOIN price_history ph ON pl.id = ph.link_id
-                WHERE pl.product_id = ?
-                GROUP BY pl.id
-            ''', (product['id'],))
-            
-            links = []
-            for link in cursor.fetchall():
-                link_dict = dict(link)
-                
-                # Processa os preços e datas
-                prices = link_dict.get('prices')
-                dates = link_dict.get('dates')
-                
-                if prices and dates:
-                    prices = [float(p) for p in prices.split(',') if p]
-                    dates = [d for d in dates.split(',') if d]
-                    link_dict['price_data'] = {
-                        'prices': prices,
-                        'dates': dates
-                    }
-                else:
-                    link_dict['price_data'] = {'prices': [], 'dates': []}
-                
-                links.append(link_dict)
-            
-            product['links'] = links
-            
+            product['links'] = []
+            products_by_id[product['id']] = product
+
+        # Busca todos os links do usuário de uma vez, com o último preço e o
+        # job de scraping ainda em andamento, se houver
+        cursor.execute('''
+            SELECT pl.*,
+                   (SELECT ph.price
+                    FROM price_history ph
+                    WHERE ph.link_id = pl.id
+                    ORDER BY ph.timestamp DESC, ph.id DESC
+                    LIMIT 1) AS current_price,
+                   (SELECT j.id
+                    FROM scrape_jobs j
+                    WHERE j.link_id = pl.id AND j.status IN ('pending', 'running')
+                    ORDER BY j.id DESC
+                    LIMIT 1) AS pending_job_id
+            FROM product_links pl
+            JOIN products p ON pl.product_id = p.id
+            WHERE p.user_id = ?
+            ORDER BY pl.id
+        ''', (user_id,))
+        for row in cursor:
+            link = dict(row)
+            products_by_id[link['product_id']]['links'].append(link)
+
         return products
 
-def get_user_by_id(user_id):
+# Resoluções aceitas por get_link_history
+HISTORY_RESOLUTIONS = ('auto', 'raw', 'day', 'week')
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', 1000))
+
+def _raw_points(cursor, link_id, since, limit):
+    cursor.execute('''
+        SELECT price, timestamp, last_seen
+        FROM price_history
+        WHERE link_id = ? AND COALESCE(last_seen, timestamp) > ?
+        ORDER BY timestamp, id
+        LIMIT ?
+    ''', (link_id, since, limit))
+    return [point for point in price_points(cursor.fetchall()) if point[1] > since]
+
+def _rollup_points(cursor, link_id, resolution, since, limit, bucket_start='', bucket_end='9999'):
+    cursor.execute('''
+        SELECT last_price, last_at
+        FROM price_rollups
+        WHERE link_id = ? AND resolution = ? AND bucket >= ? AND bucket < ? AND last_at > ?
+        ORDER BY bucket
+        LIMIT ?
+    ''', (link_id, resolution, bucket_start, bucket_end, since, limit))
+    return [tuple(row) for row in cursor.fetchall()]
+
+def get_link_history(link_id, user_id, since=None, resolution='auto', limit=HISTORY_PAGE_SIZE):
     """
-    Busca um usuário pelo ID
+    Retorna uma página do histórico de um link do usuário, em ordem
+    cronológica e a partir de since (exclusivo). 'auto' escolhe a resolução
+    pela idade: agregados semanais antes de daily_start, diários até
+    raw_start e pontos brutos depois (ver history_cutoffs); 'raw', 'day' e
+    'week' forçam uma.
+    Retorna None se o link não existir ou não for do usuário.
     """
+    since = since or ''
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT pl.id
+            FROM product_links pl
+            JOIN products p ON pl.product_id = p.id
+            WHERE pl.id = ? AND p.user_id = ?
+        ''', (link_id, user_id))
+        if not cursor.fetchone():
+            return None
+
+        # Busca um ponto a mais para saber se há próxima página
+        fetch = limit + 1
+        if resolution == 'raw':
+            points = _raw_points(cursor, link_id, since, fetch)
+        elif resolution in ('day', 'week'):
+            points = _rollup_points(cursor, link_id, resolution, since, fetch)
+        else:
+            raw_start, daily_start = history_cutoffs()
+            points = _rollup_points(cursor, link_id, 'week', since, fetch, bucket_end=daily_start)
+            if len(points) < fetch:
+                points += _rollup_points(cursor, link_id, 'day', since, fetch - len(points), daily_start, raw_start[:10])
+            if len(points) < fetch:
+                points += _raw_points(cursor, link_id, max(since, raw_start[:19]), fetch - len(points))
+
+    has_more = len(points) > limit
+    points = points[:limit]
+    return {
+        'link_id': link_id,
+        'resolution': resolution,
+        'prices': [price for price, _ in points],
+        'dates': [str(timestamp) for _, timestamp in points],
+        'next_since': str(points[-1][1]) if has_more else None
+    }
+
+_user_cache = OrderedDict()
+_user_cache_lock = threading.Lock()
+_user_cache_stats = {'hits': 0, 'misses': 0}
+
+def get_user_cache_stats():
+    with _user_cache_lock:
+        return dict(_user_cache_stats, size=len(_user_cache))
+
+def invalidate_user_cache(user_id=None):
+    """
+    Remove um usuário do cache (ou todos, sem user_id)
+    """
+    with _user_cache_lock:
+        if user_id is None:
+            _user_cache.clear()
+        else:
+            _user_cache.pop(str(user_id), None)
+
+def get_user_by_id(user_id):
+    """
+    Busca um usuário pelo ID. Chamada a cada requisição autenticada, por
+    isso guarda o resultado em um cache LRU com TTL em memória; outros
+    workers veem alterações no máximo USER_CACHE_TTL segundos depois.
+    """
+    key = str(user_id)
+    if USER_CACHE_TTL > 0:
+        with _user_cache_lock:
+            cached = _user_cache.get(key)
+            if cached and time.monotonic() - cached[0] < USER_CACHE_TTL:
+                _user_cache.move_to_end(key)
+                _user_cache_stats['hits'] += 1
+                return cached[1]
+            _user_cache_stats['misses'] += 1
+
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('''
@@ -201,7 +777,16 @@ def get_user_by_id(user_id):
             FROM users
             WHERE id = ?
         ''', (user_id,))
-        return cursor.fetchone()
+        row = cursor.fetchone()
+    user = dict(row) if row else None
+
+    if user and USER_CACHE_TTL > 0:
+        with _user_cache_lock:
+            _user_cache[key] = (time.monotonic(), user)
+            _user_cache.move_to_end(key)
+            while len(_user_cache) > USER_CACHE_MAX_ENTRIES:
+                _user_cache.popitem(last=False)
+    return user
 
 def create_or_update_user(user_id, name, email):
     """
@@ -215,6 +800,7 @@ def create_or_update_user(user_id, name, email):
             WHERE id = ?
         ''', (name, email, datetime.utcnow(), user_id))
         conn.commit()
+        invalidate_user_cache(user_id)
         return user_id
 
 def check_link_exists(product_url):
@@ -236,12 +822,12 @@ def check_link_exists(product_url):
         if link:
             # Busca histórico de preços
             cursor.execute('''
-                SELECT price, timestamp
+                SELECT price, timestamp, last_seen
                 FROM price_history
                 WHERE link_id = ?
                 ORDER BY timestamp ASC
             ''', (link['id'],))
-            price_history = cursor.fetchall()
+            price_history = list(price_points(cursor.fetchall()))
             
             return {
                 "exists": True,
@@ -264,6 +850,7 @@ def delete_product_link(link_id):
     """
     with get_db_connection() as conn:
         cursor = conn.cursor()
+        owners = _link_owners(cursor, [link_id])
         
         # Primeiro remove o histórico de preços
         cursor.execute('''
@@ -271,6 +858,9 @@ def delete_product_link(link_id):
             WHERE link_id = ?
         ''', (link_id,))
         
+        cursor.execute('DELETE FROM price_rollups WHERE link_id = ?', (link_id,))
+        cursor.execute('DELETE FROM scrape_jobs WHERE link_id = ?', (link_id,))
+
         # Depois remove o link
         cursor.execute('''
             DELETE FROM product_links
@@ -278,6 +868,7 @@ def delete_product_link(link_id):
         ''', (link_id,))
         
         conn.commit()
+        dashboard_cache.invalidate(owners)
         return cursor.rowcount > 0
 
 def get_best_price_link(product_id):
@@ -287,7 +878,7 @@ def get_best_price_link(product_id):
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT id, product_url, site_name, price, timestamp
+            SELECT product_links.id, product_url, site_name, price, timestamp
             FROM product_links
             JOIN price_history ON product_links.id = price_history.link_id
             WHERE product_id = ?
@@ -316,7 +907,9 @@ def update_product_name(product_id, new_name):
             WHERE id = ?
         ''', (new_name, product_id))
         conn.commit()
-        return cursor.rowcount > 0
+        updated = cursor.rowcount > 0
+        dashboard_cache.invalidate(_product_owner(cursor, product_id))
+        return updated
 
 def create_user(email, password, name):
     """
@@ -376,7 +969,10 @@ def create_or_update_google_user(google_id, email, name):
             FROM users
             WHERE email = ?
         ''', (email,))
-        return cursor.fetchone()
+        user = cursor.fetchone()
+        if user:
+            invalidate_user_cache(user['id'])
+        return user
 
 def delete_product_and_links(product_id):
     """
@@ -384,6 +980,7 @@ def delete_product_and_links(product_id):
     """
     with get_db_connection() as conn:
         cursor = conn.cursor()
+        owners = _product_owner(cursor, product_id)
         
         # Primeiro busca todos os links do produto
         cursor.execute('SELECT id FROM product_links WHERE product_id = ?', (product_id,))
@@ -392,6 +989,8 @@ def delete_product_and_links(product_id):
         # Remove o histórico de preços de cada link
         for link in links:
             cursor.execute('DELETE FROM price_history WHERE link_id = ?', (link['id'],))
+            cursor.execute('DELETE FROM price_rollups WHERE link_id = ?', (link['id'],))
+            cursor.execute('DELETE FROM scrape_jobs WHERE link_id = ?', (link['id'],))
             
         # Remove todos os links do produto
         cursor.execute('DELETE FROM product_links WHERE product_id = ?', (product_id,))
@@ -400,4 +999,5 @@ def delete_product_and_links(product_id):
         cursor.execute('DELETE FROM products WHERE id = ?', (product_id,))
         
         conn.commit()
+        dashboard_cache.invalidate(owners)
         return cursor.rowcount > 0
\ No newline at end of file
@@ -0,0 +1,26 @@
+import signal
+import sys
+
+import jobs
+from scheduler import run_scheduler
+from utils import init_db
+
+
+def _handle_sigterm(signum, frame):
+    # O gunicorn encerra o worker com SIGTERM (ver run.stop_worker). Sem
+    # este handler o processo morre na hora; com SystemExit a atualização em
+    # andamento sai pelos with/finally (PriceWriter grava o buffer, o lease
+    # é liberado) e os hooks do atexit ainda rodam.
+    print("Worker recebeu SIGTERM, encerrando")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    # Processo separado do servidor web: agenda a atualização de preços
+    # (um único atualizador ativo por banco, garantido pelo lease) e
+    # processa a fila de jobs de scraping
+    signal.signal(signal.SIGTERM, _handle_sigterm)
+    # As threads de jobs usam o banco antes do agendador: migra primeiro
+    init_db()
+    jobs.ensure_workers()
+    run_scheduler()